@@ -0,0 +1,435 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks for the tree and heap code in the lab 9 module.
+
+Every benchmark is timed with timeit and then run once more under
+tracemalloc to find its peak memory use. Results can be saved as a JSON
+baseline and later runs can be compared against it, in which case the
+exit status is 1 when any benchmark got slower than the tolerance allows.
+
+    python bench_lab9.py --levels 4 10 16 --save baseline.json
+    python bench_lab9.py --levels 4 10 16 --compare baseline.json"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import functools
+import io
+import json
+import queue
+import random
+import sys
+import threading
+import timeit
+import tracemalloc
+
+import modules
+
+# Public Names
+__all__ = (
+    'Benchmark',
+    'main',
+    'tree_benchmarks',
+    'heap_benchmarks',
+    'contention_benchmarks',
+    'backend_benchmarks',
+    'scheduler_benchmarks',
+    'run_benchmark',
+    'compare_results'
+)
+
+# Module Documentation
+__version__ = 1, 0, 0
+__date__ = datetime.date(2022, 11, 21)
+__author__ = 'Aurel Villyani'
+__credits__ = 'CS 331'
+
+# Symbolic Constants
+DEFAULT_LEVELS = 4, 10, 16, 22
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+TREE_KINDS = {
+    'node': modules.BinaryTreeNode,
+    'compact': modules.CompactTreeNode,
+    'array': modules.ArrayTree
+}
+MAX_HEAP_LEVELS = 20
+HEAP_KINDS = {
+    'heap': modules.AdvHeapQueue,
+    'wrapped': lambda: _WrappedRevHeapQueue(),
+    'rev': modules.RevHeapQueue,
+    'key': lambda: modules.KeyHeapQueue(key=abs),
+    'key-rev': lambda: modules.KeyHeapQueue(key=abs, reverse=True)
+}
+BACKENDS = {
+    'binary': modules.BinaryHeap,
+    'dary-2': functools.partial(modules.DaryHeap, arity=2),
+    'dary-4': modules.DaryHeap,
+    'dary-8': functools.partial(modules.DaryHeap, arity=8),
+    'pairing': modules.PairingHeap,
+    'instrumented': modules.InstrumentedHeap
+}
+SCHEDULERS = {
+    'scheduler': modules.Scheduler,
+    'timer-wheel': lambda clock: modules.TimerWheel(clock=clock)
+}
+CONTENTION_ITEMS = 1 << 14
+CONTENTION_WORKERS = (1, 1), (4, 4), (8, 2)
+THREAD_QUEUES = {
+    'thread-heap': modules.ThreadHeapQueue,
+    'thread-rev': lambda maxsize: modules.ThreadHeapQueue(
+        maxsize, modules.RevHeapQueue),
+    'priority': queue.PriorityQueue
+}
+ASYNC_QUEUES = {
+    'async-heap': modules.AsyncHeapQueue,
+    'async-rev': lambda maxsize: modules.AsyncHeapQueue(
+        maxsize, modules.RevHeapQueue),
+    'async-priority': asyncio.PriorityQueue
+}
+
+Benchmark = collections.namedtuple('Benchmark', 'name setup run')
+
+
+def main():
+    """Run the selected benchmarks and save or compare the results."""
+    arguments = parse_arguments()
+    results = {}
+    for benchmark in all_benchmarks(arguments.levels):
+        if arguments.filter and arguments.filter not in benchmark.name:
+            continue
+        seconds, peak = run_benchmark(benchmark, arguments.repeat)
+        results[benchmark.name] = {'seconds': seconds, 'peak_bytes': peak}
+        print(f'{benchmark.name:52}{seconds * 1e3:12.3f} ms'
+              f'{peak / 1024:14.1f} KiB', flush=True)
+    if arguments.save:
+        with open(arguments.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, results, arguments.tolerance)
+        for name, old, new in regressions:
+            print(f'REGRESSION {name}: {old * 1e3:.3f} ms -> '
+                  f'{new * 1e3:.3f} ms', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def parse_arguments():
+    """Read the command line options for the benchmark run."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', type=int, nargs='+',
+                        default=DEFAULT_LEVELS,
+                        help='tree sizes to try, as levels (2**levels - 1 '
+                             'nodes)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='number of timings to take the best of')
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the results to a JSON baseline file')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results with a JSON baseline file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown before a run counts as a '
+                             'regression (0.25 means 25%%)')
+    return parser.parse_args()
+
+
+def all_benchmarks(levels):
+    """Yield every benchmark the suite knows about."""
+    yield from tree_benchmarks(levels)
+    yield from heap_benchmarks(levels)
+    yield from contention_benchmarks()
+    yield from backend_benchmarks(levels)
+    yield from scheduler_benchmarks(levels)
+
+
+def tree_benchmarks(levels):
+    """Yield benchmarks for each tree function, kind of tree, and size."""
+    for size in levels:
+        for kind, node_type in TREE_KINDS.items():
+            yield from _tree_operations(f'{kind}/{size}',
+                                        _perfect_tree(size, node_type),
+                                        size - 1)
+        if size <= 16:
+            # A chain of 2**22 nodes is too slow to be worth building, and
+            # the smaller chains already show any change in per-node cost.
+            yield from _tree_operations(f'degenerate/{size}',
+                                        _degenerate_tree((1 << size) - 1),
+                                        (1 << size) - 2)
+
+
+def _perfect_tree(levels, node_type):
+    """Make a function that builds a perfect tree with create_tree."""
+    return lambda: modules.create_tree(levels, node_type)
+
+
+def _degenerate_tree(size):
+    """Make a function that builds a tree shaped like a linked list."""
+    def build():
+        root = node = modules.BinaryTreeNode(0)
+        for item in range(1, size):
+            node.right = modules.BinaryTreeNode(item)
+            node = node.right
+        return root
+    return build
+
+
+def _tree_operations(prefix, build, depth):
+    """Yield the benchmarks for one tree; depth is its deepest level."""
+    deepest = modules.RIGHT_NODE * depth
+    yield Benchmark(f'{prefix}/create_tree', lambda: None,
+                    lambda _: build())
+    yield Benchmark(f'{prefix}/display_tree', build,
+                    lambda tree: modules.display_tree(tree,
+                                                      file=io.StringIO()))
+    yield Benchmark(f'{prefix}/invert_tree', build, modules.invert_tree)
+    yield Benchmark(f'{prefix}/tree_to_list', build, modules.tree_to_list)
+    yield Benchmark(f'{prefix}/iter_tree', build,
+                    lambda tree: collections.deque(modules.iter_tree(tree),
+                                                   0))
+    # No tree here holds -1, so every search has to visit every node.
+    yield Benchmark(f'{prefix}/breadth_first_search_tree', build,
+                    lambda tree: modules.breadth_first_search_tree(tree, -1))
+    yield Benchmark(f'{prefix}/get_item_from_tree', build,
+                    lambda tree: modules.get_item_from_tree(tree, deepest))
+
+
+def heap_benchmarks(levels):
+    """Yield push and pop benchmarks for each kind of heap and size."""
+    for size in levels:
+        # The heaps hold 2**levels items, capped so the larger tree sizes
+        # do not make the heap runs take minutes.
+        size = min(size, MAX_HEAP_LEVELS)
+        items = random.Random(size).sample(range(1 << size), 1 << size)
+        for kind, heap_type in HEAP_KINDS.items():
+            prefix = f'{kind}/{size}'
+            yield Benchmark(f'{prefix}/push', lambda: None,
+                            lambda _, h=heap_type: _push_all(h(), items))
+            yield Benchmark(f'{prefix}/push_pop', lambda: None,
+                            lambda _, h=heap_type: _pop_all(
+                                _push_all(h(), items)))
+            yield Benchmark(f'{prefix}/extend', lambda: None,
+                            lambda _, h=heap_type: h().extend(items))
+            yield Benchmark(f'{prefix}/extend_pop_many', lambda: None,
+                            lambda _, h=heap_type: _extend_pop_many(h(),
+                                                                    items))
+            yield Benchmark(f'{prefix}/extend_iter', lambda: None,
+                            lambda _, h=heap_type: collections.deque(
+                                _extend(h(), items), 0))
+
+
+def backend_benchmarks(levels):
+    """Yield push-heavy, pop-heavy, and mixed traces for each backend."""
+    for size in levels:
+        size = min(size, MAX_HEAP_LEVELS)
+        rng = random.Random(size)
+        items = rng.sample(range(1 << size), 1 << size)
+        # The mixed trace pushes on True and pops on False, starting from
+        # a heap of half the items so that it never runs dry.
+        actions = [rng.random() < 0.5 for _ in items]
+        for kind, backend in BACKENDS.items():
+            prefix = f'{kind}/{size}'
+            yield Benchmark(f'{prefix}/push_heavy', lambda: None,
+                            lambda _, b=backend: _push_heavy(b, items))
+            yield Benchmark(f'{prefix}/pop_heavy', lambda: None,
+                            lambda _, b=backend: _pop_heavy(b, items))
+            yield Benchmark(f'{prefix}/mixed', lambda: None,
+                            lambda _, b=backend: _mixed(b, items, actions))
+
+
+def scheduler_benchmarks(levels):
+    """Yield benchmarks that set many short timeouts and cancel most."""
+    for size in levels:
+        size = min(size, MAX_HEAP_LEVELS)
+        rng = random.Random(size)
+        delays = [rng.uniform(0.001, 1) for _ in range(1 << size)]
+        for kind, scheduler in SCHEDULERS.items():
+            yield Benchmark(f'{kind}/{size}/timeouts', lambda: None,
+                            lambda _, s=scheduler: _timeouts(s, delays))
+
+
+def _timeouts(scheduler_type, delays):
+    """Set a timeout for each delay, cancel nine in ten, and run the rest."""
+    now = [0.0]
+    scheduler = scheduler_type(lambda: now[0])
+    schedule = scheduler.schedule_after
+    cancel = scheduler.cancel
+    for index, delay in enumerate(delays):
+        job = schedule(delay, int)
+        if index % 10:
+            cancel(job)
+        now[0] += 1e-6
+    now[0] += 1
+    scheduler.run_pending()
+
+
+def _push_heavy(backend, items):
+    """Push every item one at a time and pop an eighth of them."""
+    heap = modules.HeapQueue(backend=backend)
+    push = heap.push
+    for item in items:
+        push(item)
+    pop = heap.pop
+    for _ in range(len(items) >> 3):
+        pop()
+
+
+def _pop_heavy(backend, items):
+    """Build the heap from every item and pop them all one at a time."""
+    heap = modules.HeapQueue(items.copy(), backend)
+    pop = heap.pop
+    for _ in range(len(items)):
+        pop()
+
+
+def _mixed(backend, items, actions):
+    """Replay a random mix of pushes and pops on a half-full heap."""
+    heap = modules.HeapQueue(items[::2], backend)
+    push = heap.push
+    pop = heap.pop
+    for item, pushing in zip(items, actions):
+        if pushing:
+            push(item)
+        else:
+            pop()
+
+
+def contention_benchmarks():
+    """Yield benchmarks for shared queues with producers and consumers."""
+    items = random.Random(331).sample(range(CONTENTION_ITEMS),
+                                      CONTENTION_ITEMS)
+    for producers, consumers in CONTENTION_WORKERS:
+        suffix = f'{producers}x{consumers}'
+        for kind, queue_type in THREAD_QUEUES.items():
+            yield Benchmark(f'{kind}/{suffix}/put_get', lambda: None,
+                            lambda _, q=queue_type, p=producers,
+                            c=consumers: _run_threads(q, items, p, c))
+        for kind, queue_type in ASYNC_QUEUES.items():
+            yield Benchmark(f'{kind}/{suffix}/put_get', lambda: None,
+                            lambda _, q=queue_type, p=producers,
+                            c=consumers: asyncio.run(
+                                _run_tasks(q, items, p, c)))
+
+
+def _run_threads(queue_type, items, producers, consumers):
+    """Pass the items through a small bounded queue between threads."""
+    shared = queue_type(64)
+    stop = len(items)
+
+    def produce(start):
+        for item in items[start::producers]:
+            shared.put(item)
+
+    def consume():
+        while shared.get() != stop:
+            pass
+
+    threads = [threading.Thread(target=consume) for _ in range(consumers)]
+    threads += [threading.Thread(target=produce, args=(start,))
+                for start in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads[consumers:]:
+        thread.join()
+    # The stop markers sort after every item, so each consumer drains the
+    # queue before it sees one.
+    for _ in range(consumers):
+        shared.put(stop)
+    for thread in threads[:consumers]:
+        thread.join()
+
+
+async def _run_tasks(queue_type, items, producers, consumers):
+    """Pass the items through a small bounded queue between tasks."""
+    shared = queue_type(64)
+    stop = len(items)
+
+    async def produce(start):
+        for item in items[start::producers]:
+            await shared.put(item)
+
+    async def consume():
+        while await shared.get() != stop:
+            pass
+
+    tasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+    await asyncio.gather(*map(produce, range(producers)))
+    for _ in range(consumers):
+        await shared.put(stop)
+    await asyncio.gather(*tasks)
+
+
+def _push_all(heap, items):
+    """Push every item onto the heap one at a time and return the heap."""
+    push = heap.push
+    for item in items:
+        push(item)
+    return heap
+
+
+def _pop_all(heap):
+    """Pop every item from the heap one at a time."""
+    pop = heap.pop
+    for _ in range(len(heap)):
+        pop()
+
+
+def _extend(heap, items):
+    """Add every item to the heap in one batch and return the heap."""
+    heap.extend(items)
+    return heap
+
+
+def _extend_pop_many(heap, items):
+    """Add every item in one batch and take them back out in one batch."""
+    heap.extend(items)
+    heap.pop_many(len(items))
+
+
+class _WrappedRevHeapQueue(modules.AdvHeapQueue):
+    """The original RevHeapQueue that wraps every item in _Reverse."""
+
+    def push(self, item):
+        """Wrap the item before pushing into onto the heap."""
+        super().push(modules._Reverse(item))
+
+    def pop(self):
+        """Unwrap each item before returning it to the caller."""
+        return super().pop().item
+
+
+def run_benchmark(benchmark, repeat=DEFAULT_REPEAT):
+    """Time a benchmark and measure its peak memory in a separate run."""
+    state = benchmark.setup()
+    timer = timeit.Timer(lambda: benchmark.run(state))
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat, number)) / number
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        benchmark.run(state)
+        peak = tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def compare_results(baseline, results, tolerance=DEFAULT_TOLERANCE):
+    """List (name, old, new) for every benchmark that became slower."""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            old = baseline[name]['seconds']
+            new = result['seconds']
+            if new > old * (1 + tolerance):
+                regressions.append((name, old, new))
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
@@ -18,9 +18,41 @@ individual checks that need to be satisfied for the module you will be creating
 this week. After you have verified the program works correctly, upload the
 Python program to this assignment in Canvas."""
 
+import array
+import asyncio
 import collections
+import contextlib
 import datetime
+import functools
 import heapq
+import itertools
+import json
+import math
+import mmap
+import numbers
+import operator
+import pickle
+import os
+import queue
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    from itertools import pairwise
+except ImportError:
+    from itertools import tee as _tee
+
+
+    def pairwise(iterable):
+        """s -> (s0,s1), (s1,s2), (s2, s3), ..."""
+        a, b = _tee(iterable)
+        next(b, None)
+        return zip(a, b)
 
 # Public Names
 __all__ = (
@@ -30,12 +62,42 @@ __all__ = (
     'tree_to_list',
     'iter_tree',
     'breadth_first_search_tree',
+    'search_tree',
     'get_item_from_tree',
+    'save_tree',
+    'load_tree',
+    'merge_heaps',
+    'PRE_ORDER',
+    'IN_ORDER',
+    'POST_ORDER',
+    'LEVEL_ORDER',
     'BinaryTreeNode',
     'NODE_TYPES',
+    'CompactTreeNode',
+    'ArrayTree',
+    'MappedTreeNode',
+    'TreeIndex',
+    'SearchTree',
+    'TREE_TYPES',
+    'PARALLEL_THRESHOLD',
     'HeapQueue',
     'AdvHeapQueue',
-    'RevHeapQueue'
+    'RevHeapQueue',
+    'KeyHeapQueue',
+    'IndexedHeapQueue',
+    'ExternalHeapQueue',
+    'Scheduler',
+    'TimerWheel',
+    'ScheduledJob',
+    'ThreadHeapQueue',
+    'AsyncHeapQueue',
+    'HeapBackend',
+    'BinaryHeap',
+    'DaryHeap',
+    'PairingHeap',
+    'InstrumentedHeap',
+    'HeapStats',
+    'HeapHandle'
 )
 
 # Module Documentation
@@ -47,12 +109,48 @@ __credits__ = 'CS 331'
 # Symbolic Constants
 LEFT_NODE = '/'
 RIGHT_NODE = '\\'
-
-
-def create_tree(levels):
+PRE_ORDER = 'pre'
+IN_ORDER = 'in'
+POST_ORDER = 'post'
+LEVEL_ORDER = 'level'
+_GET_ITEM = operator.attrgetter('item')
+_GET_ENTRY = operator.attrgetter('entry')
+_PATH_BITS = str.maketrans(LEFT_NODE + RIGHT_NODE, '01')
+_PATH_DIRECTIONS = str.maketrans('', '', LEFT_NODE + RIGHT_NODE)
+_TREE_INDEXES = weakref.WeakSet()
+_DISPLAY_BATCH = 1 << 12
+_FILE_HEADER = struct.Struct('<4s2c2xQ')
+_FILE_MAGIC = b'BTR1'
+_FILE_BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+_HAS_LEFT = 1
+_HAS_RIGHT = 2
+_UNSET = object()
+# Trees with fewer nodes than this are always handled serially. There is
+# no measured crossover behind the value: with the GIL, thread pools never
+# beat walking the tree in place, and process pools pay to pickle the node
+# subtrees (about ten times slower on 2 ** 19 nodes). It only keeps small
+# trees away from the executor until free-threaded builds give it meaning.
+PARALLEL_THRESHOLD = 1 << 16
+_SPLIT_DEPTH = 4
+_NEGATABLE_TYPES = frozenset({int, float})
+_SORT_FRACTION = 3
+_SPILL_LIMIT = 1 << 16
+_MAX_RUNS = 32
+_RUN_BLOCK = 1 << 10
+_MANIFEST_NAME = 'manifest.json'
+_COMPACT_MINIMUM = 64
+
+
+def create_tree(levels, node_type=None):
     """Build an example tree a total of levels deep."""
+    if node_type is None:
+        node_type = BinaryTreeNode
+    elif node_type not in _BUILD_TYPES:
+        raise TypeError(f'node_type must be one of {_BUILD_TYPES!r}')
+    if node_type is ArrayTree:
+        return ArrayTree.from_levels(levels)
     source = iter(range(1, 1 << levels))
-    root = _create_node(source, levels)
+    root = _create_node(source, levels, node_type)
     try:
         next(source)
     except StopIteration:
@@ -61,26 +159,78 @@ def create_tree(levels):
         raise RuntimeError('source was not exhausted when building tree')
 
 
-def _create_node(iterable, level):
+def _create_node(iterable, level, node_type=None):
     """Recursively build nodes based on the current level."""
     if level > 0:
-        node = BinaryTreeNode(next(iterable))
+        if node_type is None:
+            node_type = BinaryTreeNode
         next_level = level - 1
-        node.left = _create_node(iterable, next_level)
-        node.right = _create_node(iterable, next_level)
-        return node
-
-
-def display_tree(root, left='L', right='R'):
+        # The children are built first so that they can be handed straight
+        # to the constructor, which lets CompactTreeNode skip validation.
+        item = next(iterable)
+        left = _create_node(iterable, next_level, node_type)
+        right = _create_node(iterable, next_level, node_type)
+        if node_type is CompactTreeNode:
+            return CompactTreeNode(item, left, right, validate=False)
+        return node_type(item, left, right)
+
+
+def display_tree(root, left='L', right='R', file=None, *, fmt='text',
+                 max_depth=None, max_nodes=None):
     """Print a representation of the tree to standard output."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
     for direction in left, right:
         if not isinstance(direction, str):
             raise TypeError('left and right must be of type str')
         if len(direction) != 1:
             raise ValueError('left and right must be a single character')
-    _display_node(root, '', left, right)
+    if fmt not in _DISPLAY_FORMATS:
+        raise ValueError(f'fmt {fmt!r} is not valid')
+    _check_limits(max_depth, max_nodes)
+    # Lines go to any text stream (standard output by default) and are
+    # written in batches; fmt may also be 'tsv' or 'jsonl' for tooling.
+    if file is None:
+        file = sys.stdout
+    format_line = _DISPLAY_FORMATS[fmt]
+    directions = left, right
+    path = []
+    lines = []
+    add_line, join = lines.append, ''.join
+    steps = _walk_steps(root, max_depth)
+    if max_nodes is not None:
+        steps = itertools.islice(steps, max_nodes)
+    for depth, direction, item in steps:
+        if depth:
+            del path[depth - 1:]
+            path.append(directions[direction])
+        add_line(format_line(join(path), item))
+        if len(lines) == _DISPLAY_BATCH:
+            file.write(join(lines))
+            lines.clear()
+    file.write(join(lines))
+
+
+def _format_text_line(path, item):
+    """Format a node the way display_tree has always printed it."""
+    return f'{path if path else "ROOT"!s}: {item!r}\n'
+
+
+def _format_tsv_line(path, item):
+    """Format a node as a tab-separated path and item representation."""
+    return f'{path!s}\t{item!r}\n'
+
+
+def _format_jsonl_line(path, item):
+    """Format a node as one JSON object holding its path and item."""
+    return json.dumps({'path': path, 'item': item}, default=repr) + '\n'
+
+
+_DISPLAY_FORMATS = {
+    'text': _format_text_line,
+    'tsv': _format_tsv_line,
+    'jsonl': _format_jsonl_line
+}
 
 
 def _display_node(node, path, left, right):
@@ -91,11 +241,24 @@ def _display_node(node, path, left, right):
         _display_node(node.right, f'{path!s}{right!s}', left, right)
 
 
-def invert_tree(root):
+def invert_tree(root, *, executor=None, split_depth=_SPLIT_DEPTH):
     """Swap all of the left and right nodes with each other."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
-    _invert_node(root)
+    for index in tuple(_TREE_INDEXES):
+        index.invalidate(root)
+    # Given a concurrent.futures executor, large trees are cut split_depth
+    # levels down and the subtrees below the cut are inverted as tasks.
+    if _use_parallel(root, executor, split_depth):
+        if isinstance(root, ArrayTree):
+            return _invert_array_in_parallel(root, executor, split_depth)
+        return _invert_nodes_in_parallel(root, executor, split_depth)
+    if isinstance(root, ArrayTree):
+        return root.invert()
+    # The walk reads the children after each node is yielded, so swapping
+    # them here still visits every node exactly once.
+    for node in _walk(root, PRE_ORDER):
+        node.left, node.right = node.right, node.left
 
 
 def _invert_node(node):
@@ -107,14 +270,20 @@ def _invert_node(node):
         _invert_node(node.right)
 
 
-def tree_to_list(root):
+def tree_to_list(root, order=PRE_ORDER, *, executor=None,
+                 split_depth=_SPLIT_DEPTH):
     """Take all values from the tree and place them in a list."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
-    # Create a list called items.
-    items = []
-    _node_to_list(root, items)
-    return items
+    # Only pre-order lists are built in parallel; the subtree lists come
+    # back in order and are spliced in between the items above the cut.
+    if order == PRE_ORDER and _use_parallel(root, executor, split_depth):
+        if isinstance(root, ArrayTree):
+            return _array_to_list_in_parallel(root, executor, split_depth)
+        return _nodes_to_list_in_parallel(root, executor, split_depth)
+    if isinstance(root, ArrayTree):
+        return root.to_list(order)
+    return list(map(_GET_ITEM, _walk(root, order)))
 
 
 def _node_to_list(node, items):
@@ -125,11 +294,14 @@ def _node_to_list(node, items):
         _node_to_list(node.right, items)
 
 
-def iter_tree(root):
+def iter_tree(root, order=PRE_ORDER):
     """After checking the root's type, iterate over all item in a tree."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
-    yield from _iter_node(root)
+    if isinstance(root, ArrayTree):
+        yield from root.iter_items(order)
+    else:
+        yield from map(_GET_ITEM, _walk(root, order))
 
 
 def _iter_node(node):
@@ -140,29 +312,83 @@ def _iter_node(node):
         yield from _iter_node(node.right)
 
 
-def breadth_first_search_tree(root, item):
+def breadth_first_search_tree(root, item, *, max_depth=None,
+                              max_nodes=None):
     """Attempt to find the shortest path to an item found in a tree."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
+        raise TypeError('root of tree must be of type BinaryTreeNode')
+    _check_limits(max_depth, max_nodes)
+    if isinstance(root, ArrayTree):
+        return root.search(item, _count_searchable(root, max_depth, max_nodes))
+    # Paths are carried as integer codes and only the one that is found
+    # gets turned back into a string.
+    for code, node in itertools.islice(_walk_codes(root, max_depth),
+                                       max_nodes):
+        if node.item == item:
+            return _code_to_path(code)
+    return None
+
+
+def search_tree(root, items, *, max_depth=None, max_nodes=None):
+    """Find the shortest paths to many items with one breadth-first pass."""
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
-    nodes = collections.deque([(root, '')])
-    while nodes:
-        node, path = nodes.popleft()
-        if node is not None:
-            if node.item == item:
-                return path if path else 'ROOT'
-            nodes.append((node.left, path + LEFT_NODE))
-            nodes.append((node.right, path + RIGHT_NODE))
+    _check_limits(max_depth, max_nodes)
+    # Items that are not found within max_depth levels or the first
+    # max_nodes nodes are left out of the dictionary that is returned.
+    targets = set(items)
+    found = {}
+    if isinstance(root, ArrayTree):
+        size = _count_searchable(root, max_depth, max_nodes)
+        codes = itertools.count(1)
+        candidates = zip(codes, itertools.islice(root.items, size))
+    else:
+        candidates = ((code, node.item) for code, node in itertools.islice(
+            _walk_codes(root, max_depth), max_nodes))
+    for code, item in candidates:
+        if item in targets and item not in found:
+            found[item] = code
+            if len(found) == len(targets):
+                break
+    return {item: _code_to_path(code) for item, code in found.items()}
+
+
+def _check_limits(max_depth, max_nodes):
+    """Make sure that the depth and node limits of a walk are usable."""
+    for limit in max_depth, max_nodes:
+        if limit is not None and limit < 0:
+            raise ValueError('max_depth and max_nodes must not be negative')
+
+
+def _count_searchable(tree, max_depth, max_nodes):
+    """Work out how much of an array-backed tree a search may look at."""
+    size = len(tree)
+    if max_depth is not None:
+        size = min(size, (2 << max_depth) - 1)
+    if max_nodes is not None:
+        size = min(size, max_nodes)
+    return size
 
 
 def get_item_from_tree(root, path):
     """Retrieve the item that corresponds with the given path."""
-    if not isinstance(root, BinaryTreeNode):
+    if not isinstance(root, TREE_TYPES):
         raise TypeError('root of tree must be of type BinaryTreeNode')
     if not isinstance(path, str):
         raise TypeError('path must be of type str')
+    if isinstance(root, ArrayTree):
+        return root.get_item(path)
     if path == 'ROOT':
         return root.item
-    return _get_item_from_node(root, path)
+    node = root
+    for direction in path:
+        if direction == LEFT_NODE:
+            node = node.left
+        elif direction == RIGHT_NODE:
+            node = node.right
+        else:
+            raise ValueError(f'direction {direction!r} is not valid')
+    return node.item
 
 
 def _get_item_from_node(node, path):
@@ -177,6 +403,527 @@ def _get_item_from_node(node, path):
     raise ValueError(f'direction {direction!r} is not valid')
 
 
+def save_tree(root, path):
+    """Write the shape and items of a tree to a compact binary file."""
+    if not isinstance(root, TREE_TYPES):
+        raise TypeError('root of tree must be of type BinaryTreeNode')
+    # The file holds a header, two bits of shape per node in pre-order, the
+    # items packed into an array, and the pre-order index of every right
+    # child so that load_tree can find any node without reading the rest.
+    items = []
+    shape = bytearray()
+    rights = array.array('q')
+    for index, (item, flags, parent) in enumerate(_walk_shape(root)):
+        if not index & 3:
+            shape.append(0)
+        shape[-1] |= flags << ((index & 3) << 1)
+        items.append(item)
+        rights.append(0)
+        if parent is not None:
+            rights[parent] = index
+    typecode = _get_item_typecode(items)
+    with open(path, 'wb') as file:
+        file.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_BYTE_ORDER,
+                                     typecode.encode(), len(items)))
+        for section in shape, array.array(typecode, items), rights:
+            data = bytes(section)
+            file.write(data + bytes(-len(data) % 8))
+
+
+def load_tree(path, lazy=False, node_type=None):
+    """Read a tree back from a file that was written by save_tree."""
+    # With lazy set, the file is memory-mapped and MappedTreeNode objects
+    # are only created as their parents' children are first looked at.
+    if node_type is None:
+        node_type = BinaryTreeNode
+    elif not lazy and node_type not in (BinaryTreeNode, CompactTreeNode):
+        raise TypeError('node_type must be BinaryTreeNode or CompactTreeNode')
+    tree = _TreeFile(path)
+    if lazy and tree.count:
+        return MappedTreeNode(tree, 0)
+    try:
+        if not tree.count:
+            return None
+        # Every node is created up front, and then the right-child table
+        # links each parent to its children without a stack of open nodes.
+        nodes = list(map(node_type, tree.items.tolist()))
+        shape = tree.shape
+        rights = tree.rights
+        for index, byte in enumerate(shape):
+            index <<= 2
+            while byte:
+                if byte & _HAS_LEFT:
+                    nodes[index].left = nodes[index + 1]
+                if byte & _HAS_RIGHT:
+                    nodes[index].right = nodes[rights[index]]
+                byte >>= 2
+                index += 1
+        return nodes[0]
+    finally:
+        tree.close()
+
+
+def _walk_shape(root):
+    """Yield (item, flags, parent of a right child) for nodes in pre-order."""
+    order = 0
+    if isinstance(root, ArrayTree):
+        items = root.items
+        size = len(items)
+        stack = [(0, None)] if size else []
+        push, pop = stack.append, stack.pop
+        while stack:
+            index, parent = pop()
+            child = 2 * index + 1
+            if child < size:
+                yield items[index], _HAS_LEFT | _HAS_RIGHT, parent
+                push((child + 1, order))
+                push((child, None))
+            else:
+                yield items[index], 0, parent
+            order += 1
+        return
+    stack = [(root, None)]
+    push, pop = stack.append, stack.pop
+    while stack:
+        node, parent = pop()
+        left, right = node.left, node.right
+        flags = 0
+        if left is not None:
+            flags |= _HAS_LEFT
+        if right is not None:
+            flags |= _HAS_RIGHT
+        yield node.item, flags, parent
+        if right is not None:
+            push((right, order))
+        if left is not None:
+            push((left, None))
+        order += 1
+
+
+def _get_item_typecode(items):
+    """Choose the array type code that can hold every item exactly."""
+    # Storing ints as doubles would change their type and round any that
+    # are above 2 ** 53, so a tree that mixes the two is refused instead.
+    typecodes = set()
+    for item in items:
+        if type(item) is float:
+            typecodes.add('d')
+        elif isinstance(item, int):
+            typecodes.add('q')
+        else:
+            raise TypeError('only int and float items can be saved')
+    if len(typecodes) > 1:
+        raise TypeError('int and float items cannot be saved together')
+    return typecodes.pop() if typecodes else 'q'
+
+
+def _use_parallel(root, executor, split_depth):
+    """Decide if a tree is large enough to be worth splitting into tasks."""
+    if executor is None:
+        return False
+    if split_depth < 1:
+        raise ValueError('split_depth must be at least 1')
+    if isinstance(root, ArrayTree):
+        return len(root) >= max(PARALLEL_THRESHOLD, 1)
+    nodes = itertools.islice(_walk(root, PRE_ORDER), PARALLEL_THRESHOLD)
+    return sum(1 for _ in nodes) >= PARALLEL_THRESHOLD
+
+
+def _split_nodes(root, split_depth):
+    """List (node, parent, side, is_subtree) in pre-order down to the cut."""
+    plan = []
+    stack = [(root, 0, None, None)]
+    push, pop = stack.append, stack.pop
+    while stack:
+        node, depth, parent, side = pop()
+        is_subtree = depth == split_depth
+        plan.append((node, parent, side, is_subtree))
+        if not is_subtree:
+            depth += 1
+            right, left = node.right, node.left
+            if right is not None:
+                push((right, depth, node, 'right'))
+            if left is not None:
+                push((left, depth, node, 'left'))
+    return plan
+
+
+def _invert_nodes_in_parallel(root, executor, split_depth):
+    """Invert the subtrees below split_depth as separate executor tasks."""
+    plan = _split_nodes(root, split_depth)
+    subtrees = [entry for entry in plan if entry[3]]
+    inverted = executor.map(_invert_subtree,
+                            [_SubtreeParcel(entry[0]) for entry in subtrees])
+    # Process pools send back inverted copies, so every subtree is linked
+    # back into its parent before the nodes above the cut are swapped.
+    for (_, parent, side, _), parcel in zip(subtrees, inverted):
+        setattr(parent, side, parcel.node)
+    for node, _, _, is_subtree in plan:
+        if not is_subtree:
+            node.left, node.right = node.right, node.left
+
+
+def _invert_subtree(parcel):
+    """Invert one subtree inside a worker and hand it back."""
+    for child in _walk(parcel.node, PRE_ORDER):
+        child.left, child.right = child.right, child.left
+    return parcel
+
+
+def _nodes_to_list_in_parallel(root, executor, split_depth):
+    """Collect the subtrees below split_depth as separate executor tasks."""
+    plan = _split_nodes(root, split_depth)
+    lists = executor.map(_subtree_to_list,
+                         [_SubtreeParcel(node) for node, _, _, is_subtree
+                          in plan if is_subtree])
+    items = []
+    for node, _, _, is_subtree in plan:
+        if is_subtree:
+            items.extend(next(lists))
+        else:
+            items.append(node.item)
+    return items
+
+
+def _subtree_to_list(parcel):
+    """List the items of one subtree in pre-order inside a worker."""
+    return list(map(_GET_ITEM, _walk(parcel.node, PRE_ORDER)))
+
+
+class _SubtreeParcel:
+    """A subtree handed to an executor that pickles without recursion."""
+
+    __slots__ = 'node',
+
+    def __init__(self, node):
+        """Initialize the _SubtreeParcel instance."""
+        self.node = node
+
+    def __reduce__(self):
+        """Send the subtree as a flat pre-order list of items and flags."""
+        # Pickling the nodes themselves recurses once for every level, so a
+        # deep or degenerate subtree would raise RecursionError.
+        node_type = type(self.node)
+        if node_type not in (BinaryTreeNode, CompactTreeNode):
+            node_type = BinaryTreeNode
+        shape = [(item, flags) for item, flags, _ in _walk_shape(self.node)]
+        return _unpack_subtree, (node_type, shape)
+
+
+def _unpack_subtree(node_type, shape):
+    """Rebuild a subtree from the flat list made by _SubtreeParcel."""
+    root = None
+    stack = []
+    push, pop = stack.append, stack.pop
+    for item, flags in shape:
+        node = node_type(item)
+        if stack:
+            # Pre-order visits a node's left subtree before its right one,
+            # so a parent waits on the stack until its last child arrives.
+            parent, pending = stack[-1]
+            if pending & _HAS_LEFT:
+                parent.left = node
+                pending &= _HAS_RIGHT
+            else:
+                parent.right = node
+                pending = 0
+            if pending:
+                stack[-1] = parent, pending
+            else:
+                pop()
+        else:
+            root = node
+        if flags:
+            push((node, flags))
+    return _SubtreeParcel(root)
+
+
+def _attach_shared(handle):
+    """Open shared memory made by _shared_copy from inside a worker."""
+    name, owner = handle
+    memory = shared_memory.SharedMemory(name)
+    # Before Python 3.13 attaching also registers the memory for cleanup,
+    # so worker processes would report it as leaked after the owner has
+    # already unlinked it.
+    if os.getpid() != owner:
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+
+@contextlib.contextmanager
+def _shared_copy(items, write_back=False):
+    """Copy an array into shared memory that workers can attach to by name."""
+    size = len(items) * items.itemsize
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        memory.buf[:size] = memoryview(items).cast('B')
+        yield memory.name, os.getpid()
+        if write_back:
+            memoryview(items).cast('B')[:] = memory.buf[:size]
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def _invert_array_in_parallel(tree, executor, split_depth):
+    """Mirror the levels below split_depth with one task per subtree pair."""
+    items = tree.items
+    levels = tree.levels
+    split_depth = min(split_depth, levels)
+    with _shared_copy(items, True) as handle:
+        tasks = [executor.submit(_invert_array_pair, handle, items.typecode,
+                                 len(items), split_depth, pair)
+                 for pair in range(1 << split_depth - 1)]
+        for task in tasks:
+            task.result()
+    for depth in range(split_depth):
+        start, stop = (1 << depth) - 1, (2 << depth) - 1
+        items[start:stop] = items[start:stop][::-1]
+
+
+def _invert_array_pair(handle, typecode, size, split_depth, pair):
+    """Swap and reverse a subtree and its mirror image in shared memory."""
+    # Mirroring a perfect tree moves subtree p at the cut to the position
+    # of subtree 2 ** split_depth - 1 - p and reverses each of its levels.
+    memory = _attach_shared(handle)
+    try:
+        view = memory.buf.cast(typecode)[:size]
+        mirror = (1 << split_depth) - 1 - pair
+        for depth in range(split_depth, size.bit_length()):
+            start = (1 << depth) - 1
+            width = 1 << depth - split_depth
+            segments = []
+            for position in pair, mirror:
+                offset = start + position * width
+                segment = array.array(typecode)
+                segment.frombytes(view[offset:offset + width].cast('B'))
+                segment.reverse()
+                segments.append((offset, segment))
+            (low, low_items), (high, high_items) = segments
+            view[low:low + width] = high_items
+            view[high:high + width] = low_items
+        view.release()
+    finally:
+        memory.close()
+
+
+def _array_to_list_in_parallel(tree, executor, split_depth):
+    """Collect the subtrees below split_depth in shared memory as tasks."""
+    items = tree.items
+    size = len(items)
+    frontier = (1 << split_depth) - 1
+    plan = []
+    stack = [0]
+    push, pop = stack.append, stack.pop
+    while stack:
+        index = pop()
+        plan.append(index)
+        child = 2 * index + 1
+        if index < frontier and child < size:
+            push(child + 1)
+            push(child)
+    with _shared_copy(items) as handle:
+        lists = executor.map(
+            _array_subtree_to_list,
+            *zip(*[(handle, items.typecode, size, index) for index in plan
+                   if index >= frontier]))
+        result = []
+        for index in plan:
+            if index >= frontier:
+                result.extend(next(lists))
+            else:
+                result.append(items[index])
+    return result
+
+
+def _array_subtree_to_list(handle, typecode, size, index):
+    """List the items of one array subtree in pre-order inside a worker."""
+    memory = _attach_shared(handle)
+    try:
+        view = memory.buf.cast(typecode)[:size]
+        result = []
+        stack = [index]
+        push, pop = stack.append, stack.pop
+        while stack:
+            index = pop()
+            result.append(view[index])
+            child = 2 * index + 1
+            if child < size:
+                push(child + 1)
+                push(child)
+        view.release()
+        return result
+    finally:
+        memory.close()
+
+
+def _walk(root, order):
+    """Yield each node of a tree in the given order without recursion."""
+    # The recursive helpers above are kept for reference; every public tree
+    # function goes through here so that depth is limited only by memory.
+    if order == PRE_ORDER:
+        stack = [root]
+        push, pop = stack.append, stack.pop
+        while stack:
+            node = pop()
+            yield node
+            right, left = node.right, node.left
+            if right is not None:
+                push(right)
+            if left is not None:
+                push(left)
+    elif order == IN_ORDER:
+        stack = []
+        push, pop = stack.append, stack.pop
+        node = root
+        while True:
+            while node is not None:
+                push(node)
+                node = node.left
+            if not stack:
+                break
+            node = pop()
+            yield node
+            node = node.right
+    elif order == POST_ORDER:
+        stack = [(root, False)]
+        push, pop = stack.append, stack.pop
+        while stack:
+            node, expanded = pop()
+            if expanded:
+                yield node
+            else:
+                push((node, True))
+                right, left = node.right, node.left
+                if right is not None:
+                    push((right, False))
+                if left is not None:
+                    push((left, False))
+    elif order == LEVEL_ORDER:
+        nodes = collections.deque([root])
+        push, pop = nodes.append, nodes.popleft
+        while nodes:
+            node = pop()
+            yield node
+            left, right = node.left, node.right
+            if left is not None:
+                push(left)
+            if right is not None:
+                push(right)
+    else:
+        raise ValueError(f'order {order!r} is not valid')
+
+
+def _walk_indices(size, order):
+    """Yield the indices of an implicit tree in the given order."""
+    # Children of index i live at 2i+1 and 2i+2, and the tree is perfect,
+    # so a child exists exactly when its index is still inside the array.
+    if order == PRE_ORDER:
+        stack = [0] if size else []
+        push, pop = stack.append, stack.pop
+        while stack:
+            index = pop()
+            yield index
+            child = 2 * index + 1
+            if child < size:
+                push(child + 1)
+                push(child)
+    elif order == IN_ORDER:
+        stack = []
+        push, pop = stack.append, stack.pop
+        index = 0
+        while True:
+            while index < size:
+                push(index)
+                index = 2 * index + 1
+            if not stack:
+                break
+            index = pop()
+            yield index
+            index = 2 * index + 2
+    elif order == POST_ORDER:
+        stack = [(0, False)] if size else []
+        push, pop = stack.append, stack.pop
+        while stack:
+            index, expanded = pop()
+            if expanded:
+                yield index
+            else:
+                push((index, True))
+                child = 2 * index + 1
+                if child < size:
+                    push((child + 1, False))
+                    push((child, False))
+    elif order == LEVEL_ORDER:
+        yield from range(size)
+    else:
+        raise ValueError(f'order {order!r} is not valid')
+
+
+def _encode_path(path):
+    """Pack a path into an integer with a leading 1 bit as a sentinel."""
+    invalid = path.translate(_PATH_DIRECTIONS)
+    if invalid:
+        raise ValueError(f'direction {invalid[0]!r} is not valid')
+    return int('1' + path.translate(_PATH_BITS), 2)
+
+
+def _decode_path(code, left=LEFT_NODE, right=RIGHT_NODE):
+    """Unpack an integer made by _encode_path back into a path string."""
+    bits = bin(code)[3:]
+    return bits.translate({48: left, 49: right})
+
+
+def _walk_codes(root, max_depth=None):
+    """Yield (code, node) in breadth-first order down to max_depth."""
+    # A code is the path packed by _encode_path, so a node at depth d has a
+    # code below 1 << d + 1 and its children are only queued when allowed.
+    limit = None if max_depth is None else 1 << max_depth
+    queue = collections.deque([(1, root)])
+    push, pop = queue.append, queue.popleft
+    while queue:
+        code, node = pop()
+        yield code, node
+        if limit is None or code < limit:
+            code <<= 1
+            left, right = node.left, node.right
+            if left is not None:
+                push((code, left))
+            if right is not None:
+                push((code | 1, right))
+
+
+def _code_to_path(code):
+    """Turn a code into the path format that the search functions return."""
+    return _decode_path(code) if code > 1 else 'ROOT'
+
+
+def _walk_steps(root, max_depth=None):
+    """Yield (depth, direction, item) in pre-order down to max_depth."""
+    # Direction is 0 for a left child and 1 for a right child, which lets
+    # display_tree keep one path buffer instead of building new strings.
+    if isinstance(root, ArrayTree):
+        items = root.items
+        size = len(items)
+        if max_depth is not None:
+            size = min(size, (2 << max_depth) - 1)
+        for index in _walk_indices(size, PRE_ORDER):
+            yield (index + 1).bit_length() - 1, 1 - (index & 1), items[index]
+        return
+    stack = [(root, 0, 0)]
+    push, pop = stack.append, stack.pop
+    while stack:
+        node, depth, direction = pop()
+        yield depth, direction, node.item
+        if max_depth is None or depth < max_depth:
+            depth += 1
+            right, left = node.right, node.left
+            if right is not None:
+                push((right, depth, 1))
+            if left is not None:
+                push((left, depth, 0))
+
+
 class BinaryTreeNode:
     """A node that can store an item and link to left and right leaves."""
 
@@ -221,16 +968,594 @@ class BinaryTreeNode:
 NODE_TYPES = BinaryTreeNode, type(None)
 
 
+class CompactTreeNode:
+    """A slotted node with plain attributes for large and fast trees."""
+
+    __slots__ = 'item', 'left', 'right'
+
+    def __init__(self, item, left=None, right=None, validate=True):
+        """Initialize the CompactTreeNode instance."""
+        # Only the constructor checks the children; assigning to left and
+        # right afterwards is a plain attribute store with no overhead.
+        if validate:
+            if not isinstance(left, _CHILD_TYPES):
+                raise TypeError(f'left must be of type {_CHILD_TYPES!r}')
+            if not isinstance(right, _CHILD_TYPES):
+                raise TypeError(f'right must be of type {_CHILD_TYPES!r}')
+        self.item = item
+        self.left = left
+        self.right = right
+
+
+class ArrayTree:
+    """A perfect tree whose items are stored in level order in an array."""
+
+    def __init__(self, items=(), typecode='q'):
+        """Initialize the ArrayTree instance."""
+        items = array.array(typecode, items)
+        size = len(items)
+        if size & (size + 1):
+            raise ValueError('number of items must be one less than a '
+                             'power of two')
+        self.__items = items
+
+    @classmethod
+    def from_levels(cls, levels, typecode='q'):
+        """Build the same items as create_tree without any node objects."""
+        # A node holding v has v + 1 as its left child and v + 2 ** h as its
+        # right child, where h is the height of the child subtrees, so each
+        # level is computed from the one above it with C-level operations.
+        instance = cls(typecode=typecode)
+        items = instance.__items
+        if levels > 0:
+            items.append(1)
+        for depth in range(1, levels):
+            parents = items[(1 << depth - 1) - 1:]
+            step = 1 << levels - depth
+            level = array.array(typecode, bytes(2 * len(parents)
+                                                * items.itemsize))
+            level[0::2] = array.array(typecode, map(operator.add, parents,
+                                                    itertools.repeat(1)))
+            level[1::2] = array.array(typecode, map(operator.add, parents,
+                                                    itertools.repeat(step)))
+            items.extend(level)
+        return instance
+
+    def __len__(self):
+        """Calculate the number of items in the tree."""
+        return len(self.__items)
+
+    @property
+    def items(self):
+        """Property for reading the items in level order."""
+        return self.__items
+
+    @property
+    def levels(self):
+        """Property for reading how many levels deep the tree is."""
+        return len(self.__items).bit_length()
+
+    def invert(self):
+        """Mirror the tree by reversing every level of the array in place."""
+        items = self.__items
+        for depth in range(self.levels):
+            start, stop = (1 << depth) - 1, (2 << depth) - 1
+            items[start:stop] = items[start:stop][::-1]
+
+    def to_list(self, order=PRE_ORDER):
+        """Take all of the items from the tree in the given order."""
+        if order == LEVEL_ORDER:
+            return self.__items.tolist()
+        return list(map(self.__items.__getitem__,
+                        _walk_indices(len(self.__items), order)))
+
+    def iter_items(self, order=PRE_ORDER):
+        """Iterate over all of the items in the tree in the given order."""
+        return map(self.__items.__getitem__,
+                   _walk_indices(len(self.__items), order))
+
+    def search(self, item, stop=None):
+        """Find the shortest path to an item, or None if it is missing."""
+        # Level order is breadth-first order, so the first match is also the
+        # one that breadth_first_search_tree would find.  array.index only
+        # takes start and stop from Python 3.10 on, so the array is sliced.
+        items = self.__items if stop is None else self.__items[:stop]
+        try:
+            index = items.index(item)
+        except ValueError:
+            return None
+        return _code_to_path(index + 1)
+
+    def get_item(self, path):
+        """Retrieve the item that is found by following the path."""
+        index = 0 if path == 'ROOT' else _encode_path(path) - 1
+        if index >= len(self.__items):
+            raise IndexError(f'path {path!r} leads outside of the tree')
+        return self.__items[index]
+
+
+class TreeIndex:
+    """A lookup table from items to paths and from paths to tree nodes."""
+
+    def __init__(self, root):
+        """Initialize the TreeIndex instance."""
+        if not isinstance(root, _NODE_CLASSES):
+            raise TypeError('root of tree must be of type BinaryTreeNode')
+        self.__root = root
+        self.__paths = None
+        self.__nodes = None
+        self.__members = frozenset()
+        _TREE_INDEXES.add(self)
+
+    @property
+    def root(self):
+        """Property for reading the root of the indexed tree."""
+        return self.__root
+
+    @property
+    def stale(self):
+        """Property that tells whether the index will be rebuilt on use."""
+        return self.__nodes is None
+
+    def invalidate(self, node=None):
+        """Forget the index if node is in the tree, or always if it is None."""
+        # Mutations through invert_tree are reported here automatically;
+        # callers that relink nodes by hand should call this themselves.
+        # The identities of the indexed nodes are kept in a set, so this
+        # check costs the same no matter how large the indexed tree is.
+        if node is None or id(node) in self.__members:
+            self.__paths = None
+            self.__nodes = None
+            self.__members = frozenset()
+
+    def __build(self):
+        """Walk the tree once in breadth-first order to fill the nodes."""
+        nodes = dict(_walk_codes(self.__root))
+        self.__nodes = nodes
+        self.__members = frozenset(map(id, nodes.values()))
+
+    def __build_paths(self):
+        """Map the items to their paths when the first search needs them."""
+        if self.__nodes is None:
+            self.__build()
+        paths = {}
+        for code, node in self.__nodes.items():
+            # The first path seen for an item is the shortest one, and ties
+            # go to the leftmost node just like breadth_first_search_tree.
+            try:
+                paths.setdefault(node.item, code)
+            except TypeError:
+                pass  # Unhashable items are found by searching the nodes.
+        self.__paths = paths
+
+    def search(self, item):
+        """Find the shortest path to an item, or None if it is missing."""
+        if self.__paths is None:
+            self.__build_paths()
+        try:
+            code = self.__paths.get(item)
+        except TypeError:
+            code = next((code for code, node in self.__nodes.items()
+                         if node.item == item), None)
+        return None if code is None else _code_to_path(code)
+
+    def get_node(self, path):
+        """Retrieve the node that is found by following the path."""
+        if not isinstance(path, str):
+            raise TypeError('path must be of type str')
+        if self.__nodes is None:
+            self.__build()
+        code = 1 if path == 'ROOT' else _encode_path(path)
+        try:
+            return self.__nodes[code]
+        except KeyError:
+            raise IndexError(f'path {path!r} leads outside of the tree') \
+                from None
+
+    def get_item(self, path):
+        """Retrieve the item that is found by following the path."""
+        return self.get_node(path).item
+
+
+class _TreeFile:
+    """The sections of a file written by save_tree, mapped into memory."""
+
+    def __init__(self, path):
+        """Initialize the _TreeFile instance."""
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The map can only be closed after every view of it is released, so
+        # the views are tracked until the file is known to be usable.
+        views = [memoryview(self.__map)]
+        try:
+            self.__read_sections(path, views)
+        except BaseException:
+            for view in reversed(views):
+                view.release()
+            self.__map.close()
+            raise
+
+    def __read_sections(self, path, views):
+        """Check the header and make views of the sections of the file."""
+        view = views[0]
+        magic, byte_order, typecode, count = _FILE_HEADER.unpack_from(view)
+        if magic != _FILE_MAGIC:
+            raise ValueError(f'{path!s} was not written by save_tree')
+        if byte_order != _FILE_BYTE_ORDER:
+            raise ValueError(f'{path!s} was saved with another byte order')
+        typecode = typecode.decode()
+        start = _FILE_HEADER.size
+        sizes = (count + 3) // 4, count * array.array(typecode).itemsize, \
+            count * 8
+        for size in sizes:
+            views.append(view[start:start + size])
+            start += size + -size % 8
+        views.append(views[2].cast(typecode))
+        views.append(views[3].cast('q'))
+        self.count = count
+        self.shape = views[1]
+        self.items = views[4]
+        self.rights = views[5]
+
+    def child(self, index, flag):
+        """Find the index of the left or right child of a node, if any."""
+        if not self.shape[index >> 2] >> ((index & 3) << 1) & flag:
+            return None
+        return index + 1 if flag == _HAS_LEFT else self.rights[index]
+
+    def close(self):
+        """Release the views and the memory map of the file."""
+        for view in self.shape, self.items, self.rights:
+            view.release()
+        self.__map.close()
+
+
+class MappedTreeNode:
+    """A node that reads its item and children lazily from a saved tree."""
+
+    __slots__ = '__tree', '__index', '__item', '__left', '__right'
+
+    def __init__(self, tree, index):
+        """Initialize the MappedTreeNode instance."""
+        self.__tree = tree
+        self.__index = index
+        self.__item = self.__left = self.__right = _UNSET
+
+    @property
+    def item(self):
+        """Property for reading and writing the item value."""
+        if self.__item is _UNSET:
+            self.__item = self.__tree.items[self.__index]
+        return self.__item
+
+    @item.setter
+    def item(self, value):
+        self.__item = value
+
+    @property
+    def left(self):
+        """Property for reading and writing the left value."""
+        if self.__left is _UNSET:
+            self.__left = self.__load_child(_HAS_LEFT)
+        return self.__left
+
+    @left.setter
+    def left(self, value):
+        if not isinstance(value, _CHILD_TYPES):
+            raise TypeError(f'left must be of type {_CHILD_TYPES!r}')
+        self.__left = value
+
+    @property
+    def right(self):
+        """Property for reading and writing the right value."""
+        if self.__right is _UNSET:
+            self.__right = self.__load_child(_HAS_RIGHT)
+        return self.__right
+
+    @right.setter
+    def right(self, value):
+        if not isinstance(value, _CHILD_TYPES):
+            raise TypeError(f'right must be of type {_CHILD_TYPES!r}')
+        self.__right = value
+
+    def __load_child(self, flag):
+        """Create the node for a child the first time it is asked for."""
+        index = self.__tree.child(self.__index, flag)
+        return None if index is None else MappedTreeNode(self.__tree, index)
+
+
+class SearchTree:
+    """An ordered set kept in a self-balancing (AVL) binary search tree."""
+
+    def __init__(self, iterable=()):
+        """Initialize the SearchTree instance."""
+        self.__root = None
+        self.__size = 0
+        for item in iterable:
+            self.insert(item)
+
+    @classmethod
+    def from_sorted(cls, items):
+        """Build a balanced tree in linear time from sorted, unique items."""
+        items = list(items)
+        for lower, upper in pairwise(items):
+            if not lower < upper:
+                raise ValueError('items must be sorted and unique')
+        instance = cls()
+        instance.__root = cls.__build(items, 0, len(items))
+        instance.__size = len(items)
+        return instance
+
+    @classmethod
+    def __build(cls, items, start, stop):
+        """Make the middle item the root of the items from start to stop."""
+        if start >= stop:
+            return None
+        middle = (start + stop) // 2
+        node = _SearchTreeNode(items[middle],
+                               cls.__build(items, start, middle),
+                               cls.__build(items, middle + 1, stop))
+        node.update_height()
+        return node
+
+    @property
+    def root(self):
+        """Property for reading the root node, which may be None."""
+        # The nodes are BinaryTreeNode instances, so display_tree, iter_tree,
+        # get_item_from_tree, and the rest all work on the root, but only
+        # the methods here keep the tree ordered and balanced.
+        return self.__root
+
+    def __len__(self):
+        """Calculate the number of items in the tree."""
+        return self.__size
+
+    def __iter__(self):
+        """Iterate over all of the items in ascending order."""
+        if self.__root is not None:
+            yield from map(_GET_ITEM, _walk(self.__root, IN_ORDER))
+
+    def __contains__(self, item):
+        """Determine if an item is in the tree."""
+        return self.__find(item) is not None
+
+    def __find(self, item):
+        """Return the node holding an item, or None if there is none."""
+        node = self.__root
+        while node is not None:
+            if item < node.item:
+                node = node.left
+            elif node.item < item:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def path(self, item):
+        """Find the path to an item for use with get_item_from_tree."""
+        directions = []
+        node = self.__root
+        while node is not None:
+            if item < node.item:
+                directions.append(LEFT_NODE)
+                node = node.left
+            elif node.item < item:
+                directions.append(RIGHT_NODE)
+                node = node.right
+            else:
+                return ''.join(directions) if directions else 'ROOT'
+        return None
+
+    def insert(self, item):
+        """Add an item to the tree and report if it was not already there."""
+        size = self.__size
+        self.__changing()
+        self.__root = self.__insert(self.__root, item)
+        return self.__size > size
+
+    def __insert(self, node, item):
+        """Add an item below node and return the rebalanced subtree."""
+        if node is None:
+            self.__size += 1
+            return _SearchTreeNode(item)
+        if item < node.item:
+            node.left = self.__insert(node.left, item)
+        elif node.item < item:
+            node.right = self.__insert(node.right, item)
+        else:
+            return node
+        return node.rebalance()
+
+    def remove(self, item):
+        """Take an item out of the tree or raise KeyError if it is missing."""
+        size = self.__size
+        self.__changing()
+        self.__root = self.__remove(self.__root, item)
+        if self.__size == size:
+            raise KeyError(item)
+
+    def discard(self, item):
+        """Take an item out of the tree if it is there."""
+        try:
+            self.remove(item)
+        except KeyError:
+            pass
+
+    def __remove(self, node, item):
+        """Take an item out from below node and return the new subtree."""
+        if node is None:
+            return None
+        if item < node.item:
+            node.left = self.__remove(node.left, item)
+        elif node.item < item:
+            node.right = self.__remove(node.right, item)
+        else:
+            self.__size -= 1
+            if node.left is None:
+                return node.right
+            if node.right is None:
+                return node.left
+            # Replace the item with its successor and remove that instead.
+            successor = node.right
+            while successor.left is not None:
+                successor = successor.left
+            node.item = successor.item
+            self.__size += 1
+            node.right = self.__remove(node.right, successor.item)
+        return node.rebalance()
+
+    def __changing(self):
+        """Mark any TreeIndex built over this tree as out of date."""
+        if self.__root is not None:
+            for index in tuple(_TREE_INDEXES):
+                index.invalidate(self.__root)
+
+    def floor(self, item):
+        """Find the largest item that is less than or equal to item."""
+        found = None
+        node = self.__root
+        while node is not None:
+            if item < node.item:
+                node = node.left
+            else:
+                found = node.item
+                if not node.item < item:
+                    break
+                node = node.right
+        return found
+
+    def ceiling(self, item):
+        """Find the smallest item that is greater than or equal to item."""
+        found = None
+        node = self.__root
+        while node is not None:
+            if node.item < item:
+                node = node.right
+            else:
+                found = node.item
+                if not item < node.item:
+                    break
+                node = node.left
+        return found
+
+    def range(self, start=None, stop=None):
+        """Iterate in order over the items from start up to but not stop."""
+        stack = []
+        push, pop = stack.append, stack.pop
+        node = self.__root
+        while True:
+            # Left subtrees are skipped when everything in them is too small.
+            while node is not None:
+                if start is not None and node.item < start:
+                    node = node.right
+                else:
+                    push(node)
+                    node = node.left
+            if not stack:
+                return
+            node = pop()
+            if stop is not None and not node.item < stop:
+                return
+            yield node.item
+            node = node.right
+
+
+class _SearchTreeNode(BinaryTreeNode):
+    """A BinaryTreeNode that also records the height of its subtree."""
+
+    def __init__(self, item, left=None, right=None):
+        """Initialize the _SearchTreeNode instance."""
+        super().__init__(item, left, right)
+        self.height = 1
+
+    def update_height(self):
+        """Recalculate the height from the heights of the children."""
+        left, right = self.left, self.right
+        self.height = 1 + max(left.height if left is not None else 0,
+                              right.height if right is not None else 0)
+
+    def balance(self):
+        """Calculate how much taller the left subtree is than the right."""
+        left, right = self.left, self.right
+        return ((left.height if left is not None else 0)
+                - (right.height if right is not None else 0))
+
+    def rebalance(self):
+        """Restore the AVL property here and return the subtree's new root."""
+        self.update_height()
+        balance = self.balance()
+        if balance > 1:
+            if self.left.balance() < 0:
+                self.left = self.left.rotate_left()
+            return self.rotate_right()
+        if balance < -1:
+            if self.right.balance() > 0:
+                self.right = self.right.rotate_right()
+            return self.rotate_left()
+        return self
+
+    def rotate_left(self):
+        """Lift the right child above this node and return it."""
+        pivot = self.right
+        self.right = pivot.left
+        pivot.left = self
+        self.update_height()
+        pivot.update_height()
+        return pivot
+
+    def rotate_right(self):
+        """Lift the left child above this node and return it."""
+        pivot = self.left
+        self.left = pivot.right
+        pivot.right = self
+        self.update_height()
+        pivot.update_height()
+        return pivot
+
+
+_NODE_CLASSES = BinaryTreeNode, CompactTreeNode, MappedTreeNode
+_BUILD_TYPES = BinaryTreeNode, CompactTreeNode, ArrayTree
+TREE_TYPES = _NODE_CLASSES + (ArrayTree,)
+_CHILD_TYPES = _NODE_CLASSES + (type(None),)
+
+
+def merge_heaps(*queues):
+    """Merge several heaps of one type into a single stream in pop order."""
+    if not all(isinstance(queue, AdvHeapQueue) for queue in queues):
+        raise TypeError('queues must be of type AdvHeapQueue')
+    if len(set(map(type, queues))) > 1:
+        raise TypeError('queues must all be of the same type')
+    if queues and not queues[0]._bulk_hooks:
+        raise TypeError('queues must not override push or pop without '
+                        'setting _wrap and _unwrap')
+    if any(queue._ordering() != queues[0]._ordering() for queue in queues):
+        raise TypeError('queues must all order their items the same way')
+    # The entries are merged rather than the items so that the wrapped
+    # heaps keep comparing in C; the queues themselves are left unchanged,
+    # and each one is read lazily so spilled runs stay on disk.
+    merged = heapq.merge(*(queue._iter_sorted() for queue in queues))
+    if queues and queues[0]._unwrap is not None:
+        return map(queues[0]._unwrap, merged)
+    return merged
+
+
 class HeapQueue:
     """Priority Queue implementation based off the heapq module."""
-    def __init__(self, heap=None):
+    def __init__(self, heap=None, backend=None):
         """Initialize the HeapQueue instance."""
         if heap is None:
             heap = []
         if not isinstance(heap, list):
             raise TypeError('heap must be a list')
-        heapq.heapify(heap)
-        self.__heap = heap
+        if backend is None:
+            backend = BinaryHeap
+        self.__heap = backend(heap)
+        if not isinstance(self.__heap, HeapBackend):
+            raise TypeError('backend must make a HeapBackend')
+        # Looking up push and pop once saves an attribute lookup on every
+        # call, which matters most for BinaryHeap's C functions.
+        self.__push = self.__heap.push
+        self.__pop = self.__heap.pop
 
     def __len__(self):
         """Calculate the size of heap."""
@@ -239,49 +1564,1486 @@ class HeapQueue:
     def push(self, item):
         """Add an item to the heap."""
         """Get an item from the heap and remove it."""
-        heapq.heappush(self.__heap, item)
+        self.__push(item)
 
     def pop(self):
         """Get an item from the heap and remove it."""
         """Add an item to the heap"""
-        return heapq.heappop(self.__heap)
+        return self.__pop()
+
+    def peek(self):
+        """Get the item that pop would return without removing it."""
+        return self.__heap.peek()
+
+    def pushpop(self, item):
+        """Push an item and then pop, faster than calling both in turn."""
+        return self.__heap.pushpop(item)
+
+    def replace(self, item):
+        """Pop an item and then push the new one, faster than both in turn."""
+        return self.__heap.replace(item)
+
+    @property
+    def backend(self):
+        """Property for the HeapBackend that stores the entries."""
+        return self.__heap
+
+    # The bulk methods below work on the entries stored in the heap; the
+    # subclasses that wrap their items set _wrap and _unwrap to convert.
+    _wrap = _unwrap = None
+
+    def _extend(self, entries):
+        """Add many entries at once."""
+        self.__heap.extend(entries)
+
+    def _pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        return self.__heap.pop_many(count)
+
+    def _peek_many(self, count):
+        """Get the first count entries in pop order without removing them."""
+        return self.__heap.peek_many(count)
+
+    def _sorted(self):
+        """Get every entry in pop order without removing them."""
+        return sorted(self.__heap)
+
+    def _iter_sorted(self):
+        """Iterate over every entry in pop order without removing them."""
+        return iter(self._sorted())
+
+    def _ordering(self):
+        """Describe the settings that decide the order of the entries."""
+        return None
 
 
 class AdvHeapQueue(HeapQueue):
     """Advanced Priority Queue that extends HeapQueue's functionality."""
 
+    # Whether the bulk hooks can be used is decided once for each subclass
+    # as it is created; see _has_bulk_hooks.
+    _bulk_hooks = True
+
+    def __init_subclass__(cls, **kwargs):
+        """Check whether the new subclass can use the bulk hooks."""
+        super().__init_subclass__(**kwargs)
+        cls._bulk_hooks = _has_bulk_hooks(cls)
+
     def __bool__(self):
         """Determine if the heap is empty or non-empty."""
         return len(self) > 0
 
     def extend(self, iterable):
         """Push each item in the iterable to the heap."""
-        for item in iterable:
-            self.push(item)
+        if not self._bulk_hooks:
+            for item in iterable:
+                self.push(item)
+        elif self._wrap is None:
+            self._extend(iterable)
+        else:
+            self._extend(map(self._wrap, iterable))
 
     def __iter__(self):
         """Pop all items from the heap while removing them."""
-        while self:
-            yield self.pop()
+        # Letting pop fail saves a call to __bool__ and __len__ per item;
+        # an IndexError from a heap that is not empty is still a real error.
+        pop = self.pop
+        while True:
+            try:
+                item = pop()
+            except IndexError:
+                if self:
+                    raise
+                return
+            yield item
+
+    def pop_many(self, count):
+        """Pop up to count items and return them as a list in pop order."""
+        if not self._bulk_hooks:
+            return [self.pop() for _ in range(min(count, len(self)))]
+        return self.__unwrap_all(self._pop_many(count))
+
+    def peek_many(self, count):
+        """Get up to count items in pop order without removing them."""
+        if not self._bulk_hooks:
+            items = self.pop_many(count)
+            self.extend(items)
+            return items
+        return self.__unwrap_all(self._peek_many(count))
+
+    def sorted_items(self):
+        """Get every item in pop order without removing any of them."""
+        if not self._bulk_hooks:
+            return self.peek_many(len(self))
+        return self.__unwrap_all(self._sorted())
+
+    def __unwrap_all(self, entries):
+        """Convert a list of heap entries back into their items."""
+        if self._unwrap is None:
+            return entries
+        return list(map(self._unwrap, entries))
+
+
+def _has_bulk_hooks(cls):
+    """Determine if a heap class's bulk hooks agree with its push and pop."""
+    # A subclass that overrides push or pop without also setting the hooks
+    # may be wrapping its items, so it has to go through one item at a time.
+    def depth(*names):
+        return next(index for index, base in enumerate(cls.__mro__)
+                    if any(name in vars(base) for name in names))
+    hooks = depth('_wrap', '_unwrap', '_extend', '_pop_many')
+    return depth('push') >= hooks and depth('pop') >= hooks
+
+
+def _reverse_entry(item):
+    """Make a (sort key, item) pair that sorts the largest items first."""
+    # Real numbers are simply negated, which keeps every comparison in C;
+    # anything else falls back to the slower _Reverse wrapper, which can
+    # still be compared with the negated numbers.
+    if type(item) in _NEGATABLE_TYPES or isinstance(item, numbers.Real):
+        return -item, item
+    return _Reverse(item), item
 
 
 class RevHeapQueue(AdvHeapQueue):
     """ Reversed Priority Queue that pops the largest item first."""
 
-    def __init__(self, heap=None):
+    _wrap = staticmethod(_reverse_entry)
+    _unwrap = operator.itemgetter(1)
+
+    def __init__(self, heap=None, backend=None):
         """Initialize the RevHeapQueue instance."""
+        # The entries go in a new list so that the caller's list is left
+        # alone, which also keeps the heap from sharing it with the caller.
         if isinstance(heap, list):
-            for offset, item in enumerate(heap):
-                heap[offset] = _Reverse(item)
-        super().__init__(heap)
+            heap = list(map(_reverse_entry, heap))
+        super().__init__(heap, backend)
 
     def push(self, item):
         """Wrap the item before pushing into onto the heap."""
-        super().push(_Reverse(item))
+        super().push(_reverse_entry(item))
 
     def pop(self):
         """Unwrap each item before returning it to the caller."""
-        return super().pop().item
+        return super().pop()[1]
+
+    def peek(self):
+        """Unwrap the item that pop would return without removing it."""
+        return super().peek()[1]
+
+    def pushpop(self, item):
+        """Wrap the item, push it, and then pop the largest item."""
+        return super().pushpop(_reverse_entry(item))[1]
+
+    def replace(self, item):
+        """Pop the largest item and then push the wrapped new item."""
+        return super().replace(_reverse_entry(item))[1]
+
+
+class KeyHeapQueue(AdvHeapQueue):
+    """Priority Queue ordered by a key function, optionally in reverse."""
+
+    _unwrap = operator.itemgetter(2)
+
+    def __init__(self, heap=None, key=None, reverse=False, backend=None):
+        """Initialize the KeyHeapQueue instance."""
+        self.__key = key
+        self.__reverse = reverse
+        # A counter between the key and the item breaks ties in the order
+        # the items arrived, so the items themselves are never compared.
+        self.__counter = itertools.count()
+        if isinstance(heap, list):
+            heap = list(map(self._wrap, heap))
+        super().__init__(heap, backend)
+
+    def _wrap(self, item):
+        """Make a (sort key, counter, item) entry for the heap."""
+        key = item if self.__key is None else self.__key(item)
+        if self.__reverse:
+            key = _reverse_entry(key)[0]
+        return key, next(self.__counter), item
+
+    def push(self, item):
+        """Wrap the item with its key before pushing it onto the heap."""
+        super().push(self._wrap(item))
+
+    def pop(self):
+        """Unwrap each item before returning it to the caller."""
+        return super().pop()[2]
+
+    def peek(self):
+        """Unwrap the item that pop would return without removing it."""
+        return super().peek()[2]
+
+    def pushpop(self, item):
+        """Wrap the item, push it, and then pop the first item."""
+        return super().pushpop(self._wrap(item))[2]
+
+    def replace(self, item):
+        """Pop the first item and then push the wrapped new item."""
+        return super().replace(self._wrap(item))[2]
+
+    def _ordering(self):
+        """Describe the settings that decide the order of the entries."""
+        return self.__key, self.__reverse
+
+
+class IndexedHeapQueue(AdvHeapQueue):
+    """Priority Queue whose items can be changed or removed by handle."""
+
+    def __init__(self, heap=None):
+        """Initialize the IndexedHeapQueue instance."""
+        if heap is None:
+            heap = []
+        if not isinstance(heap, list):
+            raise TypeError('heap must be a list')
+        # heapq cannot tell us where items move to, so this class keeps its
+        # own list of handles and updates their positions as it sifts; it
+        # overrides every method that would use HeapQueue's backend, so
+        # HeapQueue.__init__ is not called to build one.
+        self.__handles = [HeapHandle(item, position)
+                          for position, item in enumerate(heap)]
+        for position in reversed(range(len(heap) // 2)):
+            self.__sift_down(position)
+
+    def __len__(self):
+        """Calculate the size of heap."""
+        return len(self.__handles)
+
+    @property
+    def backend(self):
+        """Property for a snapshot of the handles in their heap order."""
+        return tuple(self.__handles)
+
+    def __contains__(self, handle):
+        """Determine if a handle still refers to an item in this heap."""
+        if not isinstance(handle, HeapHandle):
+            return False
+        position = handle.position
+        return (0 <= position < len(self.__handles)
+                and self.__handles[position] is handle)
+
+    def push(self, item):
+        """Add an item to the heap and return a handle that refers to it."""
+        handle = HeapHandle(item, len(self.__handles))
+        self.__handles.append(handle)
+        self.__sift_up(handle.position)
+        return handle
+
+    def pop(self):
+        """Get an item from the heap and remove it."""
+        if not self.__handles:
+            raise IndexError('index out of range')
+        return self.__remove_at(0).item
+
+    def peek(self):
+        """Get the item that pop would return without removing it."""
+        if not self.__handles:
+            raise IndexError('peek at an empty heap')
+        return self.__handles[0].item
+
+    def pushpop(self, item):
+        """Push an item and then pop, faster than calling both in turn."""
+        handles = self.__handles
+        if handles and handles[0].item < item:
+            top = handles[0]
+            handles[0] = HeapHandle(item, 0)
+            self.__sift_down(0)
+            top.position = -1
+            return top.item
+        return item
+
+    def replace(self, item):
+        """Pop an item and then push the new one, faster than both in turn."""
+        handles = self.__handles
+        if not handles:
+            raise IndexError('index out of range')
+        top = handles[0]
+        handles[0] = HeapHandle(item, 0)
+        self.__sift_down(0)
+        top.position = -1
+        return top.item
+
+    def update(self, handle, item):
+        """Give a handle a new item and move it to its proper place."""
+        self.__check(handle)
+        old, handle.item = handle.item, item
+        if item < old:
+            self.__sift_up(handle.position)
+        else:
+            self.__sift_down(handle.position)
+
+    def decrease_key(self, handle, item):
+        """Replace a handle's item with one that is not any greater."""
+        self.__check(handle)
+        if handle.item < item:
+            raise ValueError('new item is greater than the current item')
+        self.update(handle, item)
+
+    def increase_key(self, handle, item):
+        """Replace a handle's item with one that is not any smaller."""
+        self.__check(handle)
+        if item < handle.item:
+            raise ValueError('new item is smaller than the current item')
+        self.update(handle, item)
+
+    def remove(self, handle):
+        """Take a handle's item out of the heap and return the item."""
+        self.__check(handle)
+        return self.__remove_at(handle.position).item
+
+    def _extend(self, items):
+        """Add many items, re-heapifying when that beats sifting each."""
+        handles = self.__handles
+        start = len(handles)
+        handles.extend(HeapHandle(item, position)
+                       for position, item in enumerate(items, start))
+        if len(handles) - start >= start:
+            for position in reversed(range(len(handles) // 2)):
+                self.__sift_down(position)
+        else:
+            for position in range(start, len(handles)):
+                self.__sift_up(position)
+
+    def _pop_many(self, count):
+        """Remove and return the first count items in pop order."""
+        count = max(0, min(count, len(self.__handles)))
+        return [self.__remove_at(0).item for _ in range(count)]
+
+    def _peek_many(self, count):
+        """Get the first count items in pop order without removing them."""
+        return heapq.nsmallest(count, map(_GET_ITEM, self.__handles))
+
+    def _sorted(self):
+        """Get every item in pop order without removing them."""
+        return sorted(map(_GET_ITEM, self.__handles))
+
+    def __check(self, handle):
+        """Make sure that a handle belongs to an item in this heap."""
+        if handle not in self:
+            raise ValueError('handle is not in this heap')
+
+    def __remove_at(self, position):
+        """Remove the handle at a position and fill the gap it leaves."""
+        handles = self.__handles
+        handle = handles[position]
+        last = handles.pop()
+        if last is not handle:
+            handles[position] = last
+            last.position = position
+            self.__sift_up(position)
+            self.__sift_down(last.position)
+        handle.position = -1
+        return handle
+
+    def __sift_up(self, position):
+        """Move the handle at a position up until its parent is smaller."""
+        handles = self.__handles
+        handle = handles[position]
+        item = handle.item
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = handles[parent_position]
+            if not item < parent.item:
+                break
+            handles[position] = parent
+            parent.position = position
+            position = parent_position
+        handles[position] = handle
+        handle.position = position
+
+    def __sift_down(self, position):
+        """Move the handle at a position down below any smaller children."""
+        handles = self.__handles
+        size = len(handles)
+        handle = handles[position]
+        item = handle.item
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= size:
+                break
+            child = handles[child_position]
+            right_position = child_position + 1
+            if right_position < size \
+                    and handles[right_position].item < child.item:
+                child_position = right_position
+                child = handles[right_position]
+            if not child.item < item:
+                break
+            handles[position] = child
+            child.position = position
+            position = child_position
+        handles[position] = handle
+        handle.position = position
+
+
+class ExternalHeapQueue(AdvHeapQueue):
+    """Priority Queue that spills sorted runs to disk when it grows large."""
+
+    def __init__(self, heap=None, memory_limit=_SPILL_LIMIT, directory=None,
+                 max_runs=_MAX_RUNS, backend=None):
+        """Initialize the ExternalHeapQueue instance."""
+        if memory_limit < 1:
+            raise ValueError('memory_limit must be positive')
+        if max_runs < 2:
+            raise ValueError('max_runs must be at least 2')
+        self.__memory_limit = memory_limit
+        self.__max_runs = max_runs
+        self.__runs = []
+        self.__serial = 0
+        self.__garbage = []
+        # Without a directory the runs live in a temporary one that goes
+        # away with the queue; with one, flush records them in a manifest
+        # so a later queue on the same directory picks up where it left.
+        self.__durable = directory is not None
+        self.__cleanup = None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='heapqueue-')
+            self.__cleanup = weakref.finalize(self, shutil.rmtree,
+                                              directory, True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        if self.__durable:
+            self.__load_manifest()
+        # The backend holds only the entries that are still in memory.
+        super().__init__(backend=backend)
+        if heap is not None:
+            if not isinstance(heap, list):
+                raise TypeError('heap must be a list')
+            self.extend(heap)
+
+    def __enter__(self):
+        """Use the queue as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the queue when leaving the with block."""
+        self.close()
+
+    def __len__(self):
+        """Calculate the size of heap."""
+        return super().__len__() + sum(run.remaining
+                                       for _, _, run in self.__runs)
+
+    @property
+    def backend(self):
+        """Property for the HeapBackend of the entries still in memory."""
+        return super().backend
+
+    @property
+    def directory(self):
+        """Property for the directory that holds the spilled runs."""
+        return self.__directory
+
+    @property
+    def run_count(self):
+        """Property for the number of sorted runs waiting on disk."""
+        return len(self.__runs)
+
+    def push(self, item):
+        """Add an item to the heap, spilling to disk when memory is full."""
+        super().push(item)
+        if super().__len__() >= self.__memory_limit:
+            self.__spill()
+
+    def pop(self):
+        """Get an item from the heap and remove it."""
+        runs = self.__runs
+        if runs and (not super().__len__()
+                     or runs[0][0] < super().peek()):
+            head, serial, run = runs[0]
+            run.advance()
+            if run.remaining:
+                heapq.heapreplace(runs, (run.head, serial, run))
+            else:
+                heapq.heappop(runs)
+                self.__discard(run)
+            return head
+        return super().pop()
+
+    def peek(self):
+        """Get the item that pop would return without removing it."""
+        runs = self.__runs
+        if runs and (not super().__len__()
+                     or runs[0][0] < super().peek()):
+            return runs[0][0]
+        return super().peek()
+
+    def pushpop(self, item):
+        """Push an item and then pop the smallest item."""
+        self.push(item)
+        return self.pop()
+
+    def replace(self, item):
+        """Pop the smallest item and then push the new one."""
+        smallest = self.pop()
+        self.push(item)
+        return smallest
+
+    def flush(self):
+        """Write everything to disk and record it in the manifest."""
+        if super().__len__():
+            self.__spill()
+        if self.__durable:
+            manifest = {
+                'serial': self.__serial,
+                'runs': [run.state() for _, _, run in self.__runs]
+            }
+            path = os.path.join(self.__directory, _MANIFEST_NAME)
+            with open(path + '.tmp', 'w') as file:
+                json.dump(manifest, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(path + '.tmp', path)
+        self.__empty_garbage()
+
+    def close(self):
+        """Flush a durable queue and release its files."""
+        if self.__durable:
+            self.flush()
+        for _, _, run in self.__runs:
+            run.close()
+        self.__runs.clear()
+        if self.__cleanup is not None:
+            self.__cleanup()
+
+    def _extend(self, entries):
+        """Add many entries at once, spilling whenever memory fills up."""
+        entries = iter(entries)
+        while True:
+            room = self.__memory_limit - super().__len__()
+            batch = list(itertools.islice(entries, room))
+            super()._extend(batch)
+            if len(batch) < room:
+                break
+            self.__spill()
+
+    def _pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        pop = self.pop
+        return [pop() for _ in range(max(0, min(count, len(self))))]
+
+    def _peek_many(self, count):
+        """Get the first count entries in pop order without removing them."""
+        return list(itertools.islice(self.__merged(), max(0, count)))
+
+    def _sorted(self):
+        """Get every entry in pop order, reading all of the runs back in."""
+        return list(self.__merged())
+
+    def _iter_sorted(self):
+        """Iterate over every entry in pop order, reading runs as needed."""
+        return self.__merged()
+
+    def __merged(self):
+        """Merge the memory heap and the runs without consuming them."""
+        return heapq.merge(super()._sorted(),
+                           *(run.iter_remaining()
+                             for _, _, run in self.__runs))
+
+    def __spill(self):
+        """Write the memory heap to disk as a new sorted run."""
+        entries = super()._pop_many(super().__len__())
+        self.__add_run(self.__write_run(entries), len(entries))
+        if len(self.__runs) > self.__max_runs:
+            self.__merge_runs()
+
+    def __write_run(self, entries):
+        """Write sorted entries to a new run file and return its path."""
+        path = os.path.join(self.__directory, f'run-{self.__serial:08d}.pkl')
+        self.__serial += 1
+        with open(path, 'wb') as file:
+            for start in range(0, len(entries), _RUN_BLOCK):
+                pickle.dump(entries[start:start + _RUN_BLOCK], file,
+                            pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def __add_run(self, path, count, offset=0, index=0):
+        """Open a run file and put it among the runs to merge from."""
+        run = _SpillRun(path, count, offset, index)
+        heapq.heappush(self.__runs, (run.head, self.__serial, run))
+        self.__serial += 1
+
+    def __merge_runs(self):
+        """Merge every run into one so that fewer files stay open."""
+        runs = [run for _, _, run in self.__runs]
+        count = sum(run.remaining for run in runs)
+        path = os.path.join(self.__directory, f'run-{self.__serial:08d}.pkl')
+        self.__serial += 1
+        merged = heapq.merge(*(run.iter_remaining() for run in runs))
+        with open(path, 'wb') as file:
+            while block := list(itertools.islice(merged, _RUN_BLOCK)):
+                pickle.dump(block, file, pickle.HIGHEST_PROTOCOL)
+        self.__runs.clear()
+        for run in runs:
+            self.__discard(run)
+        self.__add_run(path, count)
+
+    def __discard(self, run):
+        """Close a run that is no longer needed and remove its file."""
+        run.close()
+        self.__garbage.append(run.path)
+        # A durable queue keeps old files until the next manifest no
+        # longer mentions them.
+        if not self.__durable:
+            self.__empty_garbage()
+
+    def __empty_garbage(self):
+        """Delete the run files that nothing refers to any more."""
+        for path in self.__garbage:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        self.__garbage.clear()
+
+    def __load_manifest(self):
+        """Reopen the runs recorded by an earlier queue's flush."""
+        path = os.path.join(self.__directory, _MANIFEST_NAME)
+        try:
+            with open(path) as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            manifest = {'serial': 0, 'runs': []}
+        self.__serial = manifest['serial']
+        known = set()
+        for state in manifest['runs']:
+            known.add(state['path'])
+            self.__add_run(os.path.join(self.__directory, state['path']),
+                           state['count'], state['offset'], state['index'])
+        # Runs written after the last flush were never recorded, so they
+        # are left over from a crash and their items are already counted.
+        for name in os.listdir(self.__directory):
+            if name.startswith('run-') and name not in known:
+                os.remove(os.path.join(self.__directory, name))
+
+
+class _SpillRun:
+    """Reader for a sorted run file that ExternalHeapQueue spilled."""
+
+    def __init__(self, path, count, offset=0, index=0):
+        """Initialize the _SpillRun instance."""
+        self.path = path
+        self.remaining = count
+        self.__file = open(path, 'rb')
+        self.__file.seek(offset)
+        self.__load()
+        self.__index = index
+        self.head = self.__block[index]
+
+    def advance(self):
+        """Move on to the next item in the run."""
+        self.remaining -= 1
+        self.__index += 1
+        if not self.remaining:
+            self.head = None
+            return
+        if self.__index == len(self.__block):
+            self.__load()
+            self.__index = 0
+        self.head = self.__block[self.__index]
+
+    def state(self):
+        """Describe where the run is up to so it can be reopened later."""
+        return {
+            'path': os.path.basename(self.path),
+            'count': self.remaining,
+            'offset': self.__offset,
+            'index': self.__index
+        }
+
+    def iter_remaining(self):
+        """Iterate over the items not yet taken, without taking them."""
+        remaining = self.remaining
+        with open(self.path, 'rb') as file:
+            file.seek(self.__offset)
+            block = pickle.load(file)[self.__index:]
+            while True:
+                yield from block[:remaining]
+                remaining -= len(block)
+                if remaining <= 0:
+                    return
+                block = pickle.load(file)
+
+    def close(self):
+        """Close the run's file."""
+        self.__file.close()
+
+    def __load(self):
+        """Read the next block of items from the file."""
+        self.__offset = self.__file.tell()
+        self.__block = pickle.load(self.__file)
+
+
+class ScheduledJob:
+    """A callback waiting in a Scheduler or TimerWheel for its deadline."""
+
+    __slots__ = 'deadline', 'callback', 'args', 'cancelled', 'tick'
+
+    def __init__(self, deadline, callback, args=()):
+        """Initialize the ScheduledJob instance."""
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.tick = None
+
+    def __repr__(self):
+        """Show the deadline and callback of the job."""
+        return f'{type(self).__name__}({self.deadline!r}, ' \
+               f'{self.callback!r}, {self.args!r})'
+
+    def run(self):
+        """Call the job's callback with its arguments."""
+        return self.callback(*self.args)
+
+
+class Scheduler:
+    """Runs callbacks at their deadlines, keeping the jobs in a heap."""
+
+    def __init__(self, clock=time.monotonic):
+        """Initialize the Scheduler instance."""
+        self.__clock = clock
+        self.__queue = AdvHeapQueue()
+        self.__counter = itertools.count()
+        self.__cancelled = 0
+
+    def __len__(self):
+        """Count the jobs that are still waiting to run."""
+        return len(self.__queue) - self.__cancelled
+
+    def schedule(self, at, callback, *args):
+        """Run the callback at the given time and return its job."""
+        job = ScheduledJob(at, callback, args)
+        self.__queue.push((at, next(self.__counter), job))
+        return job
+
+    def schedule_after(self, delay, callback, *args):
+        """Run the callback once the delay has passed and return its job."""
+        return self.schedule(self.__clock() + delay, callback, *args)
+
+    def cancel(self, job):
+        """Stop a job from running and tell if it was still waiting."""
+        if job.cancelled:
+            return False
+        # The job stays in the heap as a tombstone, which is cheaper than
+        # finding it; the heap is rebuilt once most of it is tombstones.
+        job.cancelled = True
+        self.__cancelled += 1
+        if self.__cancelled >= _COMPACT_MINIMUM \
+                and self.__cancelled * 2 >= len(self.__queue):
+            self.__compact()
+        return True
+
+    def next_deadline(self):
+        """Get the deadline of the next job, or None if there is none."""
+        entry = self.__first()
+        return None if entry is None else entry[0]
+
+    def run_pending(self, now=None):
+        """Run every job whose deadline has come and return how many."""
+        if now is None:
+            now = self.__clock()
+        count = 0
+        while (entry := self.__first()) is not None and entry[0] <= now:
+            job = self.__queue.pop()[2]
+            job.cancelled = True
+            count += 1
+            job.run()
+        return count
+
+    def __first(self):
+        """Drop cancelled jobs from the front and return the first entry."""
+        queue = self.__queue
+        while queue:
+            entry = queue.peek()
+            if not entry[2].cancelled:
+                return entry
+            queue.pop()
+            self.__cancelled -= 1
+        return None
+
+    def __compact(self):
+        """Rebuild the heap without the cancelled jobs."""
+        # The live entries are taken in heap order and heapified again,
+        # which is linear, rather than popped out one at a time.
+        entries = [entry for entry in self.__queue.backend
+                   if not entry[2].cancelled]
+        self.__queue = AdvHeapQueue(entries)
+        self.__cancelled = 0
+
+
+class TimerWheel:
+    """Runs callbacks at their deadlines using hierarchical timer wheels."""
+
+    def __init__(self, resolution=0.001, slots=256, levels=4,
+                 clock=time.monotonic):
+        """Initialize the TimerWheel instance."""
+        if resolution <= 0:
+            raise ValueError('resolution must be positive')
+        if slots < 2 or levels < 1:
+            raise ValueError('slots must be at least 2 and levels at least 1')
+        self.__clock = clock
+        self.__resolution = resolution
+        self.__slots = slots
+        self.__origin = clock()
+        self.__tick = 0
+        # Level n holds the jobs due within slots ** (n + 1) ticks, with
+        # each of its slots covering slots ** n ticks; jobs further away
+        # wait in a heap until they come into range.
+        self.__wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.__counts = [0] * levels
+        self.__spans = [slots ** (level + 1) for level in range(levels)]
+        self.__overflow = AdvHeapQueue()
+        self.__counter = itertools.count()
+        self.__due = []
+        self.__live = 0
+
+    def __len__(self):
+        """Count the jobs that are still waiting to run."""
+        return self.__live
+
+    def schedule(self, at, callback, *args):
+        """Run the callback at the given time and return its job."""
+        job = ScheduledJob(at, callback, args)
+        # Rounding up means that a job never runs before its deadline.
+        job.tick = math.ceil((at - self.__origin) / self.__resolution)
+        self.__place(job)
+        self.__live += 1
+        return job
+
+    def schedule_after(self, delay, callback, *args):
+        """Run the callback once the delay has passed and return its job."""
+        return self.schedule(self.__clock() + delay, callback, *args)
+
+    def cancel(self, job):
+        """Stop a job from running and tell if it was still waiting."""
+        if job.cancelled:
+            return False
+        # Cancelled jobs are left in their slots and dropped when the wheel
+        # reaches them, so cancelling never searches a slot.
+        job.cancelled = True
+        self.__live -= 1
+        return True
+
+    def next_deadline(self):
+        """Get the deadline of the next job, or None if there is none."""
+        deadlines = [job.deadline for job in self.__due if not job.cancelled]
+        for level, wheel in enumerate(self.__wheels):
+            if not self.__counts[level]:
+                continue
+            period = self.__spans[level] // self.__slots
+            current = self.__tick // period
+            for offset in range(1, self.__slots + 1):
+                live = [job.deadline
+                        for job in wheel[(current + offset) % self.__slots]
+                        if not job.cancelled]
+                if live:
+                    deadlines.append(min(live))
+                    break
+        overflow = self.__overflow
+        while overflow and overflow.peek()[3].cancelled:
+            overflow.pop()
+        if overflow:
+            deadlines.append(overflow.peek()[1])
+        return min(deadlines, default=None)
+
+    def run_pending(self, now=None):
+        """Run every job whose deadline has come and return how many."""
+        if now is None:
+            now = self.__clock()
+        self.__advance(math.floor((now - self.__origin) / self.__resolution))
+        due, self.__due = self.__due, []
+        count = 0
+        for job in due:
+            if not job.cancelled:
+                job.cancelled = True
+                self.__live -= 1
+                count += 1
+                job.run()
+        return count
+
+    def __place(self, job):
+        """Put a job into the level of the wheel that fits its deadline."""
+        delta = job.tick - self.__tick
+        if delta <= 0:
+            self.__due.append(job)
+            return
+        for level, span in enumerate(self.__spans):
+            if delta < span:
+                period = span // self.__slots
+                self.__wheels[level][job.tick // period % self.__slots] \
+                    .append(job)
+                self.__counts[level] += 1
+                return
+        # Jobs that share a tick are ordered by deadline, so the first
+        # entry always has the earliest deadline among the far away jobs.
+        self.__overflow.push((job.tick, job.deadline, next(self.__counter),
+                              job))
+
+    def __advance(self, target):
+        """Turn the wheels forward to a tick, collecting the due jobs."""
+        slots = self.__slots
+        while self.__tick < target:
+            lowest = next((level for level, count in enumerate(self.__counts)
+                           if count), None)
+            if lowest is None:
+                # With the wheels empty, skip ahead to the target or to
+                # where the first far away job comes into range.
+                tick = target
+                if self.__overflow:
+                    tick = min(tick, self.__overflow.peek()[0]
+                               - self.__spans[-1] + 1)
+                self.__tick = max(tick, self.__tick + 1)
+            else:
+                period = self.__spans[lowest] // slots
+                self.__tick = min((self.__tick // period + 1) * period,
+                                  target)
+            self.__turn()
+
+    def __turn(self):
+        """Move jobs down the levels and into the due list at this tick."""
+        tick = self.__tick
+        slots = self.__slots
+        overflow = self.__overflow
+        while overflow and overflow.peek()[0] - tick < self.__spans[-1]:
+            job = overflow.pop()[3]
+            if not job.cancelled:
+                self.__place(job)
+        for level in reversed(range(len(self.__wheels))):
+            period = self.__spans[level] // slots
+            if tick % period:
+                continue
+            slot = self.__wheels[level][tick // period % slots]
+            if not slot:
+                continue
+            jobs = slot.copy()
+            slot.clear()
+            self.__counts[level] -= len(jobs)
+            for job in jobs:
+                if not job.cancelled:
+                    self.__place(job)
+
+
+class ThreadHeapQueue(queue.Queue):
+    """Thread-safe blocking queue that keeps its items in a heap queue."""
+
+    def __init__(self, maxsize=0, heap_type=AdvHeapQueue):
+        """Initialize the ThreadHeapQueue instance."""
+        # queue.Queue calls _init from its own initializer, so the factory
+        # has to be stored first; RevHeapQueue, KeyHeapQueue via a partial,
+        # or any other AdvHeapQueue can decide the order.
+        self.__heap_type = heap_type
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        """Create the heap that holds the queued items."""
+        self.queue = _make_heap(self.__heap_type)
+
+    def _qsize(self):
+        """Count the items in the heap."""
+        return len(self.queue)
+
+    def _put(self, item):
+        """Push an item onto the heap while the lock is held."""
+        self.queue.push(item)
+
+    def _get(self):
+        """Pop an item from the heap while the lock is held."""
+        return self.queue.pop()
+
+
+class AsyncHeapQueue(asyncio.Queue):
+    """Asyncio queue that keeps its items in a heap queue."""
+
+    def __init__(self, maxsize=0, heap_type=AdvHeapQueue):
+        """Initialize the AsyncHeapQueue instance."""
+        self.__heap_type = heap_type
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        """Create the heap that holds the queued items."""
+        self._queue = _make_heap(self.__heap_type)
+
+    def _put(self, item):
+        """Push an item onto the heap."""
+        self._queue.push(item)
+
+    def _get(self):
+        """Pop an item from the heap."""
+        return self._queue.pop()
+
+    def _format(self):
+        """Describe the queue without popping the items out of its heap."""
+        # asyncio.Queue lists its items by iterating over them, which would
+        # empty an AdvHeapQueue, so it is shown a sorted copy instead.
+        heap, self._queue = self._queue, self._queue.sorted_items()
+        try:
+            return super()._format()
+        finally:
+            self._queue = heap
+
+
+def _make_heap(heap_type):
+    """Call a heap factory and make sure that it made an AdvHeapQueue."""
+    heap = heap_type()
+    if not isinstance(heap, AdvHeapQueue):
+        raise TypeError('heap_type must make an AdvHeapQueue')
+    return heap
+
+
+class HeapBackend:
+    """Storage for the entries of a HeapQueue, kept in heap order."""
+
+    def __len__(self):
+        """Count the entries in the heap."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        """Iterate over the entries in no particular order."""
+        raise NotImplementedError
+
+    def push(self, entry):
+        """Add an entry to the heap."""
+        raise NotImplementedError
+
+    def pop(self):
+        """Remove the smallest entry from the heap and return it."""
+        raise NotImplementedError
+
+    def peek(self):
+        """Get the smallest entry without removing it."""
+        raise NotImplementedError
+
+    def pushpop(self, entry):
+        """Push an entry and then pop the smallest one."""
+        if len(self) and self.peek() < entry:
+            return self.replace(entry)
+        return entry
+
+    def replace(self, entry):
+        """Pop the smallest entry and then push the new one."""
+        smallest = self.pop()
+        self.push(entry)
+        return smallest
+
+    def extend(self, entries):
+        """Push every entry from an iterable."""
+        push = self.push
+        for entry in entries:
+            push(entry)
+
+    def pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        pop = self.pop
+        return [pop() for _ in range(max(0, min(count, len(self))))]
+
+    def peek_many(self, count):
+        """Get the first count entries in pop order without removing them."""
+        return heapq.nsmallest(count, self)
+
+
+class BinaryHeap(HeapBackend):
+    """Heap backend that keeps a binary heap in a list using heapq."""
+
+    def __init__(self, items=None):
+        """Initialize the BinaryHeap instance."""
+        if items is None:
+            items = []
+        heapq.heapify(items)
+        self.__items = items
+        # heapq's functions are bound to the list instead of being called
+        # from methods, so that a push or pop never runs any Python code.
+        self.push = functools.partial(heapq.heappush, items)
+        self.pop = functools.partial(heapq.heappop, items)
+        self.pushpop = functools.partial(heapq.heappushpop, items)
+        self.replace = functools.partial(heapq.heapreplace, items)
+
+    def __len__(self):
+        """Count the entries in the heap."""
+        return len(self.__items)
+
+    def __iter__(self):
+        """Iterate over the entries in no particular order."""
+        return iter(self.__items)
+
+    def peek(self):
+        """Get the smallest entry without removing it."""
+        try:
+            return self.__items[0]
+        except IndexError:
+            raise IndexError('peek at an empty heap') from None
+
+    def extend(self, entries):
+        """Push every entry, re-heapifying when that beats pushing each."""
+        items = self.__items
+        entries = list(entries)
+        if len(entries) >= len(items):
+            items.extend(entries)
+            heapq.heapify(items)
+        else:
+            push = heapq.heappush
+            for entry in entries:
+                push(items, entry)
+
+    def pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        items = self.__items
+        count = max(0, min(count, len(items)))
+        if count * _SORT_FRACTION >= len(items):
+            # A sorted list is still a valid heap, so sorting everything in
+            # C beats popping when a good part of the heap is wanted.
+            items.sort()
+            entries = items[:count]
+            del items[:count]
+            return entries
+        pop = heapq.heappop
+        return [pop(items) for _ in range(count)]
+
+
+class DaryHeap(HeapBackend):
+    """Heap backend that keeps a heap with arity children per node."""
+
+    def __init__(self, items=None, arity=4):
+        """Initialize the DaryHeap instance."""
+        if not isinstance(arity, int):
+            raise TypeError('arity must be of type int')
+        if arity < 2:
+            raise ValueError('arity must be at least 2')
+        if items is None:
+            items = []
+        self.__items = items
+        self.__arity = arity
+        self.__heapify()
+
+    def __len__(self):
+        """Count the entries in the heap."""
+        return len(self.__items)
+
+    def __iter__(self):
+        """Iterate over the entries in no particular order."""
+        return iter(self.__items)
+
+    @property
+    def arity(self):
+        """Property for the number of children each node can have."""
+        return self.__arity
+
+    def push(self, entry):
+        """Add an entry to the heap."""
+        self.__items.append(entry)
+        self.__sift_up(len(self.__items) - 1)
+
+    def pop(self):
+        """Remove the smallest entry from the heap and return it."""
+        items = self.__items
+        if not items:
+            raise IndexError('index out of range')
+        last = items.pop()
+        if not items:
+            return last
+        smallest = items[0]
+        items[0] = last
+        self.__sift_down(0)
+        return smallest
+
+    def peek(self):
+        """Get the smallest entry without removing it."""
+        try:
+            return self.__items[0]
+        except IndexError:
+            raise IndexError('peek at an empty heap') from None
+
+    def replace(self, entry):
+        """Pop the smallest entry and then push the new one."""
+        items = self.__items
+        if not items:
+            raise IndexError('index out of range')
+        smallest = items[0]
+        items[0] = entry
+        self.__sift_down(0)
+        return smallest
+
+    def extend(self, entries):
+        """Push every entry, re-heapifying when that beats pushing each."""
+        items = self.__items
+        start = len(items)
+        items.extend(entries)
+        if len(items) - start >= start:
+            self.__heapify()
+        else:
+            for position in range(start, len(items)):
+                self.__sift_up(position)
+
+    def pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        items = self.__items
+        count = max(0, min(count, len(items)))
+        if count * _SORT_FRACTION >= len(items):
+            # A sorted list is a valid heap for any arity.
+            items.sort()
+            entries = items[:count]
+            del items[:count]
+            return entries
+        return super().pop_many(count)
+
+    def __heapify(self):
+        """Put the whole list into heap order from the bottom up."""
+        arity = self.__arity
+        for position in reversed(range((len(self.__items) + arity - 2)
+                                       // arity)):
+            self.__sift_down(position)
+
+    def __sift_up(self, position):
+        """Move the entry at a position up until its parent is smaller."""
+        items = self.__items
+        arity = self.__arity
+        entry = items[position]
+        while position > 0:
+            parent = (position - 1) // arity
+            if not entry < items[parent]:
+                break
+            items[position] = items[parent]
+            position = parent
+        items[position] = entry
+
+    def __sift_down(self, position):
+        """Move the entry at a position down below any smaller children."""
+        items = self.__items
+        arity = self.__arity
+        size = len(items)
+        entry = items[position]
+        while True:
+            first = position * arity + 1
+            if first >= size:
+                break
+            child = first
+            smallest = items[first]
+            for other in range(first + 1, min(first + arity, size)):
+                if items[other] < smallest:
+                    child = other
+                    smallest = items[other]
+            if not smallest < entry:
+                break
+            items[position] = smallest
+            position = child
+        items[position] = entry
+
+
+class PairingHeap(HeapBackend):
+    """Heap backend that keeps a pairing heap of linked nodes."""
+
+    # Every node is a list of [entry, first child, next sibling], which is
+    # smaller and faster to reach into than an object with attributes.
+
+    def __init__(self, items=None):
+        """Initialize the PairingHeap instance."""
+        self.__root = None
+        self.__size = 0
+        if items:
+            self.extend(items)
+
+    def __len__(self):
+        """Count the entries in the heap."""
+        return self.__size
+
+    def __iter__(self):
+        """Iterate over the entries in no particular order."""
+        stack = [] if self.__root is None else [self.__root]
+        while stack:
+            node = stack.pop()
+            yield node[0]
+            if node[1] is not None:
+                stack.append(node[1])
+            if node[2] is not None:
+                stack.append(node[2])
+
+    def push(self, entry):
+        """Add an entry to the heap."""
+        node = [entry, None, None]
+        root = self.__root
+        self.__root = node if root is None else _meld(root, node)
+        self.__size += 1
+
+    def pop(self):
+        """Remove the smallest entry from the heap and return it."""
+        root = self.__root
+        if root is None:
+            raise IndexError('index out of range')
+        self.__root = _meld_pairs(root[1])
+        self.__size -= 1
+        return root[0]
+
+    def peek(self):
+        """Get the smallest entry without removing it."""
+        if self.__root is None:
+            raise IndexError('peek at an empty heap')
+        return self.__root[0]
+
+
+HeapStats = collections.namedtuple(
+    'HeapStats', 'size max_size pushed popped comparisons calls seconds')
+
+
+class InstrumentedHeap(HeapBackend):
+    """Heap backend that counts and times the work of another backend."""
+
+    def __init__(self, items=None, backend=None):
+        """Initialize the InstrumentedHeap instance."""
+        if backend is None:
+            backend = BinaryHeap
+        # Every entry is wrapped so that its comparisons can be counted;
+        # the wrappers only exist while the heap is being instrumented.
+        self.__comparisons = [0]
+        self.__heap = backend([_Counted(item, self.__comparisons)
+                               for item in items or ()])
+        if not isinstance(self.__heap, HeapBackend):
+            raise TypeError('backend must make a HeapBackend')
+        self.reset()
+
+    def __len__(self):
+        """Count the entries in the heap."""
+        return len(self.__heap)
+
+    def __iter__(self):
+        """Iterate over the entries in no particular order."""
+        return map(_GET_ENTRY, self.__heap)
+
+    def stats(self):
+        """Take a snapshot of the counts and times recorded so far."""
+        return HeapStats(len(self.__heap), self.__max_size, self.__pushed,
+                         self.__popped, self.__comparisons[0],
+                         dict(self.__calls), dict(self.__seconds))
+
+    def reset(self):
+        """Start counting and timing again from zero."""
+        self.__max_size = len(self.__heap)
+        self.__pushed = self.__popped = 0
+        self.__comparisons[0] = 0
+        self.__calls = collections.Counter()
+        self.__seconds = collections.Counter()
+
+    def push(self, entry):
+        """Add an entry to the heap."""
+        start = time.perf_counter()
+        self.__heap.push(_Counted(entry, self.__comparisons))
+        self.__record('push', start, 1, 0)
+
+    def pop(self):
+        """Remove the smallest entry from the heap and return it."""
+        start = time.perf_counter()
+        entry = self.__heap.pop().entry
+        self.__record('pop', start, 0, 1)
+        return entry
+
+    def peek(self):
+        """Get the smallest entry without removing it."""
+        start = time.perf_counter()
+        entry = self.__heap.peek().entry
+        self.__record('peek', start, 0, 0)
+        return entry
+
+    def pushpop(self, entry):
+        """Push an entry and then pop the smallest one."""
+        start = time.perf_counter()
+        entry = self.__heap.pushpop(_Counted(entry, self.__comparisons)).entry
+        self.__record('pushpop', start, 1, 1)
+        return entry
+
+    def replace(self, entry):
+        """Pop the smallest entry and then push the new one."""
+        start = time.perf_counter()
+        entry = self.__heap.replace(_Counted(entry, self.__comparisons)).entry
+        self.__record('replace', start, 1, 1)
+        return entry
+
+    def extend(self, entries):
+        """Push every entry from an iterable."""
+        start = time.perf_counter()
+        counted = [_Counted(entry, self.__comparisons) for entry in entries]
+        self.__heap.extend(counted)
+        self.__record('extend', start, len(counted), 0)
+
+    def pop_many(self, count):
+        """Remove and return the first count entries in pop order."""
+        start = time.perf_counter()
+        entries = list(map(_GET_ENTRY, self.__heap.pop_many(count)))
+        self.__record('pop_many', start, 0, len(entries))
+        return entries
+
+    def peek_many(self, count):
+        """Get the first count entries in pop order without removing them."""
+        start = time.perf_counter()
+        entries = list(map(_GET_ENTRY, self.__heap.peek_many(count)))
+        self.__record('peek_many', start, 0, 0)
+        return entries
+
+    def __record(self, name, start, pushed, popped):
+        """Add one call and the time since start to the statistics."""
+        self.__seconds[name] += time.perf_counter() - start
+        self.__calls[name] += 1
+        self.__pushed += pushed
+        self.__popped += popped
+        self.__max_size = max(self.__max_size, len(self.__heap))
+
+
+class _Counted:
+    """Entry wrapper that counts how often the entries are compared."""
+
+    __slots__ = 'entry', 'counter'
+
+    def __init__(self, entry, counter):
+        """Initialize the _Counted instance."""
+        self.entry = entry
+        self.counter = counter
+
+    def __lt__(self, other):
+        """Count the comparison and then compare the wrapped entries."""
+        self.counter[0] += 1
+        return self.entry < other.entry
+
+
+def _meld(first, second):
+    """Join two pairing heap roots and return the new root."""
+    if second[0] < first[0]:
+        first, second = second, first
+    second[2] = first[1]
+    first[1] = second
+    return first
+
+
+def _meld_pairs(node):
+    """Join a list of sibling pairing heap nodes into one heap."""
+    # The usual two passes: meld neighbours left to right, and then fold
+    # the results together from right to left.
+    pairs = []
+    while node is not None:
+        second = node[2]
+        if second is None:
+            pairs.append(node)
+            break
+        following = second[2]
+        node[2] = second[2] = None
+        pairs.append(_meld(node, second))
+        node = following
+    root = None
+    for pair in reversed(pairs):
+        root = pair if root is None else _meld(pair, root)
+    return root
+
+
+class HeapHandle:
+    """A reference to an item in an IndexedHeapQueue and where it is."""
+
+    __slots__ = 'item', 'position'
+
+    def __init__(self, item, position=-1):
+        """Initialize the HeapHandle instance."""
+        self.item = item
+        self.position = position
+
+    def __repr__(self):
+        """Show the item and position that the handle refers to."""
+        return f'{type(self).__name__}({self.item!r}, {self.position!r})'
 
 
 class _Reverse:
@@ -291,9 +3053,36 @@ class _Reverse:
         """Initialize the RevHeapQueue instance."""
         self.__item = item
 
+    # A wrapper stands for its item negated, so it can also be compared to
+    # the negated numbers that _reverse_entry puts in the same heap.  Ties
+    # compare equal, which lets tuples fall through to their next field.
+
+    def __eq__(self, other):
+        """Compare the items, which are equal exactly when reversed."""
+        other = self.__unwrap(other)
+        return other if other is NotImplemented else self.__item == other
+
     def __lt__(self, other):
         """Compliment the meaning of the less-than operator."""
-        return self.__item >= other.__item
+        other = self.__unwrap(other)
+        return other if other is NotImplemented else other < self.__item
+
+    def __gt__(self, other):
+        """Compliment the meaning of the greater-than operator."""
+        other = self.__unwrap(other)
+        return other if other is NotImplemented else self.__item < other
+
+    __hash__ = None
+
+    @staticmethod
+    def __unwrap(other):
+        """Find the item a wrapper or a negated number stands for."""
+        if isinstance(other, _Reverse):
+            return other.__item
+        try:
+            return -other
+        except TypeError:
+            return NotImplemented
 
     @property
     def item(self):
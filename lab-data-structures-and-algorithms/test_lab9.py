@@ -18,12 +18,24 @@ individual checks that need to be satisfied for the module you will be creating
 this week. After you have verified the program works correctly, upload the
 Python program to this assignment in Canvas."""
 
+import asyncio
+import concurrent.futures
+import contextlib
 import datetime
+import decimal
+import fractions
 import inspect
+import io
+import json
 import operator
+import os
+import queue
 import random
+import tempfile
 import test.support
+import threading
 import unittest
+import unittest.mock
 
 try:
     from itertools import pairwise
@@ -42,10 +54,30 @@ import modules
 # Public Names
 __all__ = (
     'TestTreeFunctions',
+    'TestTreeTraversal',
     'TestBinaryTreeNode',
+    'TestCompactTreeNode',
+    'TestArrayTree',
+    'TestTreeIndex',
+    'TestDisplayTreeStream',
+    'TestSaveLoadTree',
+    'TestParallelTree',
+    'TestSearchTree',
+    'TestBoundedSearch',
     'TestHeapQueue',
     'TestAdvHeapQueue',
-    'TestRevHeapQueue'
+    'TestRevHeapQueue',
+    'TestKeyHeapQueue',
+    'TestIndexedHeapQueue',
+    'TestExternalHeapQueue',
+    'TestScheduler',
+    'TestTimerWheel',
+    'TestBinaryHeap',
+    'TestDaryHeap',
+    'TestPairingHeap',
+    'TestInstrumentedHeap',
+    'TestThreadHeapQueue',
+    'TestAsyncHeapQueue'
 )
 
 # Module Documentation
@@ -369,6 +401,84 @@ ROOT: 1
             self.assertEqual(item, modules.get_item_from_tree(tree, path))
 
 
+class TestTreeTraversal(unittest.TestCase):
+    """Test the traversal orders and the handling of very deep trees."""
+
+    DEPTH = 10_000
+
+    @classmethod
+    def create_degenerate_tree(cls, depth, direction='left'):
+        """Build a tree shaped like a linked list depth nodes long."""
+        root = node = modules.BinaryTreeNode(0)
+        for item in range(1, depth):
+            child = modules.BinaryTreeNode(item)
+            setattr(node, direction, child)
+            node = child
+        return root
+
+    def test_orders(self):
+        """Test that every traversal order visits the items correctly."""
+        tree = modules.create_tree(3)
+        for order, expected in (
+                (modules.PRE_ORDER, [1, 2, 3, 4, 5, 6, 7]),
+                (modules.IN_ORDER, [3, 2, 4, 1, 6, 5, 7]),
+                (modules.POST_ORDER, [3, 4, 2, 6, 7, 5, 1]),
+                (modules.LEVEL_ORDER, [1, 2, 5, 3, 4, 6, 7])):
+            with self.subTest(order=order):
+                self.assertEqual(expected, modules.tree_to_list(tree, order))
+                self.assertEqual(expected,
+                                 list(modules.iter_tree(tree, order)))
+
+    def test_default_order(self):
+        """Test that pre-order traversal is used when none is given."""
+        tree = modules.create_tree(5)
+        self.assertEqual(modules.tree_to_list(tree, modules.PRE_ORDER),
+                         modules.tree_to_list(tree))
+
+    def test_order_error(self):
+        """Test that an unknown traversal order is rejected."""
+        with self.assertRaises(ValueError) as cm:
+            modules.tree_to_list(modules.BinaryTreeNode(None), 'sideways')
+        self.assertEqual(("order 'sideways' is not valid",), cm.exception.args)
+
+    def test_deep_tree_to_list(self):
+        """Test that degenerate trees do not exhaust the recursion limit."""
+        for direction in 'left', 'right':
+            tree = self.create_degenerate_tree(self.DEPTH, direction)
+            for order in (modules.PRE_ORDER, modules.IN_ORDER,
+                          modules.POST_ORDER, modules.LEVEL_ORDER):
+                with self.subTest(direction=direction, order=order):
+                    items = modules.tree_to_list(tree, order)
+                    self.assertEqual(self.DEPTH, len(items))
+                    self.assertCountEqual(range(self.DEPTH), items)
+
+    def test_deep_tree_invert(self):
+        """Test that inverting a degenerate tree flips the whole chain."""
+        tree = self.create_degenerate_tree(self.DEPTH)
+        modules.invert_tree(tree)
+        self.assertIsNone(tree.left)
+        path = modules.RIGHT_NODE * (self.DEPTH - 1)
+        self.assertEqual(self.DEPTH - 1,
+                         modules.get_item_from_tree(tree, path))
+
+    def test_deep_tree_display(self):
+        """Test that display_tree can show a degenerate tree."""
+        tree = self.create_degenerate_tree(self.DEPTH)
+        with test.support.captured_stdout() as stdout:
+            modules.display_tree(tree)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(self.DEPTH, len(lines))
+        self.assertEqual(f'{"L" * (self.DEPTH - 1)}: {self.DEPTH - 1}',
+                         lines[-1])
+
+    def test_deep_tree_search(self):
+        """Test that breadth-first search finds the deepest item."""
+        tree = self.create_degenerate_tree(self.DEPTH)
+        self.assertEqual(modules.LEFT_NODE * (self.DEPTH - 1),
+                         modules.breadth_first_search_tree(tree,
+                                                           self.DEPTH - 1))
+
+
 class TestBinaryTreeNode(unittest.TestCase):
     """Test the class used to organize binary trees in the lab 9 module."""
 
@@ -461,6 +571,690 @@ class TestBinaryTreeNode(unittest.TestCase):
             cm.exception.args)
 
 
+class TestCompactTreeNode(unittest.TestCase):
+    """Test the slotted node class that trades checking for speed."""
+
+    def test_no_instance_dict(self):
+        """Test that instances are slotted and have no __dict__."""
+        instance = modules.CompactTreeNode(None)
+        self.assertFalse(hasattr(instance, '__dict__'))
+
+    def test_attributes(self):
+        """Test that item, left, and right are stored as given."""
+        child = modules.CompactTreeNode(2)
+        instance = modules.CompactTreeNode(1, child)
+        self.assertEqual(1, instance.item)
+        self.assertIs(child, instance.left)
+        self.assertIsNone(instance.right)
+
+    def test_validate(self):
+        """Test that the constructor checks the children by default."""
+        with self.assertRaises(TypeError):
+            modules.CompactTreeNode(None, left=[])
+        with self.assertRaises(TypeError):
+            modules.CompactTreeNode(None, right=[])
+
+    def test_validate_disabled(self):
+        """Test that checking can be skipped for bulk construction."""
+        instance = modules.CompactTreeNode(None, [], validate=False)
+        self.assertEqual([], instance.left)
+
+    def test_create_tree(self):
+        """Test that create_tree can build trees out of compact nodes."""
+        tree = modules.create_tree(4, modules.CompactTreeNode)
+        self.assertIsInstance(tree, modules.CompactTreeNode)
+        self.assertSequenceEqual(modules.tree_to_list(tree), range(1, 16))
+
+    def test_create_tree_node_type_error(self):
+        """Test that create_tree rejects unknown node types."""
+        with self.assertRaises(TypeError):
+            modules.create_tree(2, dict)
+
+    def test_interchangeable(self):
+        """Test that the tree functions treat both node types the same."""
+        trees = [modules.create_tree(4),
+                 modules.create_tree(4, modules.CompactTreeNode)]
+        outputs = []
+        for tree in trees:
+            modules.invert_tree(tree)
+            with test.support.captured_stdout() as stdout:
+                modules.display_tree(tree)
+            path = modules.breadth_first_search_tree(tree, 7)
+            outputs.append((stdout.getvalue(),
+                            list(modules.iter_tree(tree)),
+                            path,
+                            modules.get_item_from_tree(tree, path)))
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class TestArrayTree(unittest.TestCase):
+    """Test the implicit tree that keeps its items in a flat array."""
+
+    LEVELS = 5
+
+    def test_create_tree(self):
+        """Test that create_tree can build an array-backed tree."""
+        tree = modules.create_tree(self.LEVELS, modules.ArrayTree)
+        self.assertIsInstance(tree, modules.ArrayTree)
+        self.assertEqual((1 << self.LEVELS) - 1, len(tree))
+        self.assertEqual(self.LEVELS, tree.levels)
+
+    def test_create_tree_zero(self):
+        """Test that an array-backed tree can be empty."""
+        tree = modules.create_tree(0, modules.ArrayTree)
+        self.assertEqual(0, len(tree))
+        self.assertEqual([], modules.tree_to_list(tree))
+        self.assertIsNone(modules.breadth_first_search_tree(tree, 1))
+
+    def test_size_error(self):
+        """Test that only perfect trees can be stored."""
+        with self.assertRaises(ValueError):
+            modules.ArrayTree([1, 2])
+
+    def test_same_as_node_tree(self):
+        """Test that every tree function agrees with the node-based tree."""
+        trees = [modules.create_tree(self.LEVELS),
+                 modules.create_tree(self.LEVELS, modules.ArrayTree)]
+        outputs = []
+        for tree in trees:
+            output = []
+            for _ in range(2):
+                with test.support.captured_stdout() as stdout:
+                    modules.display_tree(tree, '<', '>')
+                output.append(stdout.getvalue())
+                for order in (modules.PRE_ORDER, modules.IN_ORDER,
+                              modules.POST_ORDER, modules.LEVEL_ORDER):
+                    output.append(modules.tree_to_list(tree, order))
+                    output.append(list(modules.iter_tree(tree, order)))
+                for item in range(1 << self.LEVELS):
+                    path = modules.breadth_first_search_tree(tree, item)
+                    output.append(path)
+                    if path is not None:
+                        output.append(modules.get_item_from_tree(tree, path))
+                modules.invert_tree(tree)
+            outputs.append(output)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_get_item_outside(self):
+        """Test that following a path past the leaves is an error."""
+        tree = modules.create_tree(2, modules.ArrayTree)
+        with self.assertRaises(IndexError):
+            modules.get_item_from_tree(tree, '//')
+        with self.assertRaises(ValueError):
+            modules.get_item_from_tree(tree, ' ')
+
+    def test_large_tree(self):
+        """Test that a large tree can be built and queried quickly."""
+        levels = 20
+        tree = modules.create_tree(levels, modules.ArrayTree)
+        last = (1 << levels) - 1
+        path = modules.RIGHT_NODE * (levels - 1)
+        self.assertEqual(path, modules.breadth_first_search_tree(tree, last))
+        modules.invert_tree(tree)
+        self.assertEqual(last, modules.get_item_from_tree(
+            tree, modules.LEFT_NODE * (levels - 1)))
+
+
+class TestTreeIndex(unittest.TestCase):
+    """Test the lookup tables that can be built over a tree."""
+
+    def test_root_type(self):
+        """Test that only node-based trees can be indexed."""
+        with self.assertRaises(TypeError):
+            modules.TreeIndex(None)
+
+    def test_matches_search(self):
+        """Test that the index agrees with the tree functions."""
+        for node_type in modules.BinaryTreeNode, modules.CompactTreeNode:
+            tree = modules.create_tree(5, node_type)
+            index = modules.TreeIndex(tree)
+            for item in range(1 << 6):
+                path = modules.breadth_first_search_tree(tree, item)
+                self.assertEqual(path, index.search(item))
+                if path is not None:
+                    self.assertEqual(item, index.get_item(path))
+
+    def test_duplicates(self):
+        """Test that the shortest and then leftmost path is indexed."""
+        tree = modules.BinaryTreeNode(
+            0,
+            modules.BinaryTreeNode(1, modules.BinaryTreeNode(2)),
+            modules.BinaryTreeNode(2, modules.BinaryTreeNode(1),
+                                   modules.BinaryTreeNode(3)))
+        index = modules.TreeIndex(tree)
+        for item in 1, 2, 3:
+            self.assertEqual(modules.breadth_first_search_tree(tree, item),
+                             index.search(item))
+
+    def test_get_node(self):
+        """Test that paths are resolved to the nodes themselves."""
+        tree = modules.create_tree(3)
+        index = modules.TreeIndex(tree)
+        self.assertIs(tree, index.get_node('ROOT'))
+        self.assertIs(tree, index.get_node(''))
+        self.assertIs(tree.right.left, index.get_node('\\/'))
+
+    def test_get_node_errors(self):
+        """Test the errors raised for unusable paths."""
+        index = modules.TreeIndex(modules.create_tree(2))
+        with self.assertRaises(TypeError):
+            index.get_node(None)
+        with self.assertRaises(ValueError) as cm:
+            index.get_node('/ ')
+        self.assertEqual(("direction ' ' is not valid",), cm.exception.args)
+        with self.assertRaises(IndexError):
+            index.get_node('//')
+
+    def test_invert_tree_invalidates(self):
+        """Test that inverting the tree or a subtree refreshes the index."""
+        tree = modules.create_tree(3)
+        index = modules.TreeIndex(tree)
+        self.assertEqual('/', index.search(2))
+        modules.invert_tree(tree)
+        self.assertTrue(index.stale)
+        self.assertEqual('\\', index.search(2))
+        modules.invert_tree(tree.right)
+        self.assertEqual('\\/', index.search(3))
+
+    def test_invalidate(self):
+        """Test that manual changes are seen after invalidating."""
+        tree = modules.create_tree(2)
+        index = modules.TreeIndex(tree)
+        self.assertIsNone(index.search(4))
+        tree.left.left = modules.BinaryTreeNode(4)
+        index.invalidate()
+        self.assertEqual('//', index.search(4))
+
+    def test_unhashable_items(self):
+        """Test that unhashable items can be indexed and searched for."""
+        tree = modules.BinaryTreeNode(
+            [0], modules.BinaryTreeNode(1), modules.BinaryTreeNode([2]))
+        index = modules.TreeIndex(tree)
+        self.assertEqual('/', index.search(1))
+        self.assertEqual('\\', index.search([2]))
+        self.assertIsNone(index.search([3]))
+        self.assertEqual([0], index.get_item('ROOT'))
+
+
+class TestDisplayTreeStream(unittest.TestCase):
+    """Test the streaming and machine-readable options of display_tree."""
+
+    TREE_TYPES = modules.BinaryTreeNode, modules.ArrayTree
+
+    def display(self, tree, *args, **kwargs):
+        """Capture what display_tree writes to a separate stream."""
+        file = io.StringIO()
+        modules.display_tree(tree, *args, file=file, **kwargs)
+        return file.getvalue()
+
+    def test_file(self):
+        """Test that writing to a stream matches printing to stdout."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(4, node_type)
+            with test.support.captured_stdout() as stdout:
+                modules.display_tree(tree)
+            self.assertEqual(stdout.getvalue(), self.display(tree))
+
+    def test_large_tree(self):
+        """Test that output spanning many batches is complete."""
+        tree = modules.create_tree(14, modules.CompactTreeNode)
+        lines = self.display(tree).splitlines()
+        self.assertEqual((1 << 14) - 1, len(lines))
+        self.assertEqual(f'{"R" * 13}: {(1 << 14) - 1}', lines[-1])
+
+    def test_max_depth(self):
+        """Test that nodes below max_depth are left out."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(4, node_type)
+            self.assertEqual('ROOT: 1\nL: 2\nR: 9\n',
+                             self.display(tree, max_depth=1))
+            self.assertEqual('ROOT: 1\n', self.display(tree, max_depth=0))
+
+    def test_max_nodes(self):
+        """Test that output stops after max_nodes lines."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(4, node_type)
+            self.assertEqual('ROOT: 1\nL: 2\nLL: 3\n',
+                             self.display(tree, max_nodes=3))
+
+    def test_limit_error(self):
+        """Test that negative limits are rejected."""
+        with self.assertRaises(ValueError):
+            self.display(modules.create_tree(2), max_depth=-1)
+        with self.assertRaises(ValueError):
+            self.display(modules.create_tree(2), max_nodes=-1)
+
+    def test_tsv(self):
+        """Test the tab-separated format."""
+        tree = modules.create_tree(2)
+        tree.right.item = 'a\tb'
+        self.assertEqual("\t1\n/\t2\n\\\t'a\\tb'\n",
+                         self.display(tree, '/', '\\', fmt='tsv'))
+
+    def test_jsonl(self):
+        """Test that JSON Lines output has paths usable by the module."""
+        tree = modules.create_tree(3)
+        text = self.display(tree, '/', '\\', fmt='jsonl')
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(7, len(records))
+        for record in records:
+            self.assertEqual(record['item'], modules.get_item_from_tree(
+                tree, record['path']))
+
+    def test_fmt_error(self):
+        """Test that an unknown output format is rejected."""
+        with self.assertRaises(ValueError):
+            self.display(modules.create_tree(2), fmt='xml')
+
+
+class TestSaveLoadTree(unittest.TestCase):
+    """Test writing trees to files and reading them back again."""
+
+    def setUp(self):
+        """Create a temporary directory to hold the saved trees."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tree.bin')
+
+    def round_trip(self, tree, **kwargs):
+        """Save a tree and then load it with the given options."""
+        modules.save_tree(tree, self.path)
+        return modules.load_tree(self.path, **kwargs)
+
+    def assertSameTree(self, expected, actual):
+        """Check that two trees have the same shape and items."""
+        outputs = []
+        for tree in expected, actual:
+            file = io.StringIO()
+            modules.display_tree(tree, file=file)
+            outputs.append(file.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_root_type(self):
+        """Test that only trees can be saved."""
+        with self.assertRaises(TypeError):
+            modules.save_tree(None, self.path)
+
+    def test_item_type(self):
+        """Test that items other than numbers are rejected."""
+        with self.assertRaises(TypeError):
+            modules.save_tree(modules.BinaryTreeNode('text'), self.path)
+
+    def test_eager(self):
+        """Test that a loaded tree is built out of the requested nodes."""
+        tree = modules.create_tree(6)
+        modules.invert_tree(tree.left)
+        for node_type in modules.BinaryTreeNode, modules.CompactTreeNode:
+            loaded = self.round_trip(tree, node_type=node_type)
+            self.assertIsInstance(loaded, node_type)
+            self.assertSameTree(tree, loaded)
+
+    def test_lazy(self):
+        """Test that a memory-mapped tree behaves like the original."""
+        tree = modules.create_tree(6)
+        modules.invert_tree(tree.left)
+        loaded = self.round_trip(tree, lazy=True)
+        self.assertIsInstance(loaded, modules.MappedTreeNode)
+        self.assertSameTree(tree, loaded)
+        modules.invert_tree(loaded)
+        modules.invert_tree(tree)
+        self.assertSameTree(tree, loaded)
+
+    def test_irregular_shape(self):
+        """Test trees with missing children and float items."""
+        tree = modules.BinaryTreeNode(
+            1.5,
+            None,
+            modules.BinaryTreeNode(2.5, modules.BinaryTreeNode(3.5), None))
+        for kwargs in {}, {'lazy': True}:
+            loaded = self.round_trip(tree, **kwargs)
+            self.assertSameTree(tree, loaded)
+            self.assertEqual(1.5, loaded.item)
+            self.assertIsNone(loaded.left)
+            self.assertIsNone(loaded.right.right)
+
+    def test_array_tree(self):
+        """Test that array-backed trees can be saved as well."""
+        tree = modules.create_tree(5, modules.ArrayTree)
+        modules.invert_tree(tree)
+        for kwargs in {}, {'lazy': True}:
+            self.assertSameTree(tree, self.round_trip(tree, **kwargs))
+
+    def test_empty(self):
+        """Test that an empty array-backed tree loads as None."""
+        self.assertIsNone(
+            self.round_trip(modules.create_tree(0, modules.ArrayTree)))
+
+    def test_not_a_tree_file(self):
+        """Test that other files are not mistaken for trees."""
+        with open(self.path, 'wb') as file:
+            file.write(bytes(64))
+        with self.track_maps() as maps, self.assertRaises(ValueError):
+            modules.load_tree(self.path)
+        self.assertTrue(maps[0].closed)
+
+    def test_eager_load_closes(self):
+        """Test that loading every node releases the mapped file."""
+        for tree in (modules.create_tree(3),
+                     modules.create_tree(0, modules.ArrayTree)):
+            modules.save_tree(tree, self.path)
+            with self.track_maps() as maps:
+                modules.load_tree(self.path)
+            self.assertTrue(maps[0].closed)
+
+    def test_mixed_items(self):
+        """Test that ints are never rounded by being saved as floats."""
+        big = (1 << 53) + 1
+        tree = modules.BinaryTreeNode(big, modules.BinaryTreeNode(-big))
+        self.assertEqual([big, -big],
+                         modules.tree_to_list(self.round_trip(tree)))
+        tree.right = modules.BinaryTreeNode(0.5)
+        with self.assertRaises(TypeError) as cm:
+            modules.save_tree(tree, self.path)
+        self.assertEqual(('int and float items cannot be saved together',),
+                         cm.exception.args)
+
+    @contextlib.contextmanager
+    def track_maps(self):
+        """Record every memory map that is opened while it is active."""
+        maps = []
+        create = modules.mmap.mmap
+
+        def track(*args, **kwargs):
+            maps.append(create(*args, **kwargs))
+            return maps[-1]
+
+        with unittest.mock.patch.object(modules.mmap, 'mmap', track):
+            yield maps
+
+    def test_deep_tree(self):
+        """Test that saving and loading do not rely on recursion."""
+        depth = 10_000
+        tree = TestTreeTraversal.create_degenerate_tree(depth, 'right')
+        for kwargs in {}, {'lazy': True}:
+            loaded = self.round_trip(tree, **kwargs)
+            self.assertEqual(list(range(depth)),
+                             modules.tree_to_list(loaded))
+
+
+class TestParallelTree(unittest.TestCase):
+    """Test splitting tree work into tasks run by an executor."""
+
+    LEVELS = 7
+    TREE_TYPES = (modules.BinaryTreeNode, modules.CompactTreeNode,
+                  modules.ArrayTree)
+
+    def setUp(self):
+        """Make even small trees use the parallel code paths."""
+        patcher = unittest.mock.patch.object(modules, 'PARALLEL_THRESHOLD', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check_executor(self, executor):
+        """Compare parallel and serial results for every kind of tree."""
+        for node_type in self.TREE_TYPES:
+            for split_depth in 1, 3, self.LEVELS + 1:
+                with self.subTest(node_type=node_type,
+                                  split_depth=split_depth):
+                    serial = modules.create_tree(self.LEVELS, node_type)
+                    modules.invert_tree(serial.left if node_type is not
+                                        modules.ArrayTree else serial)
+                    tree = modules.create_tree(self.LEVELS, node_type)
+                    modules.invert_tree(tree.left if node_type is not
+                                        modules.ArrayTree else tree)
+                    self.assertEqual(
+                        modules.tree_to_list(serial),
+                        modules.tree_to_list(tree, executor=executor,
+                                             split_depth=split_depth))
+                    modules.invert_tree(serial)
+                    modules.invert_tree(tree, executor=executor,
+                                        split_depth=split_depth)
+                    self.assertEqual(modules.tree_to_list(serial),
+                                     modules.tree_to_list(tree))
+
+    def test_thread_pool(self):
+        """Test the parallel mode with a pool of threads."""
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            self.check_executor(executor)
+
+    def test_process_pool(self):
+        """Test the parallel mode with a pool of processes."""
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            self.check_executor(executor)
+
+    def test_deep_subtree(self):
+        """Test that a degenerate subtree can be sent to a process."""
+        chain = None
+        for item in range(70000):
+            chain = modules.BinaryTreeNode(item, chain)
+        tree = modules.BinaryTreeNode(-1, chain, modules.BinaryTreeNode(-2))
+        expected = modules.tree_to_list(tree)
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            self.assertEqual(expected, modules.tree_to_list(
+                tree, executor=executor, split_depth=1))
+            modules.invert_tree(tree, executor=executor, split_depth=1)
+        self.assertEqual(-2, tree.left.item)
+        self.assertEqual(0, modules.get_item_from_tree(
+            tree, modules.RIGHT_NODE + modules.RIGHT_NODE * 69999))
+
+    def test_below_threshold(self):
+        """Test that small trees never reach the executor."""
+        executor = unittest.mock.Mock(spec=concurrent.futures.Executor)
+        with unittest.mock.patch.object(modules, 'PARALLEL_THRESHOLD', 1000):
+            for node_type in self.TREE_TYPES:
+                tree = modules.create_tree(4, node_type)
+                modules.invert_tree(tree, executor=executor)
+                modules.tree_to_list(tree, executor=executor)
+        self.assertFalse(executor.method_calls)
+
+    def test_split_depth_error(self):
+        """Test that the tree cannot be cut above the root's children."""
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            with self.assertRaises(ValueError):
+                modules.invert_tree(modules.create_tree(3),
+                                    executor=executor, split_depth=0)
+
+
+class TestSearchTree(unittest.TestCase):
+    """Test the self-balancing search tree built from BinaryTreeNode."""
+
+    def assertBalanced(self, tree):
+        """Check the ordering and the AVL height limit of every node."""
+        def height(node):
+            if node is None:
+                return 0
+            left, right = height(node.left), height(node.right)
+            self.assertLessEqual(abs(left - right), 1)
+            return 1 + max(left, right)
+        if tree.root is not None:
+            self.assertEqual(sorted(tree),
+                             modules.tree_to_list(tree.root, modules.IN_ORDER))
+        height(tree.root)
+
+    def test_random_operations(self):
+        """Test inserts and removals against a built-in set."""
+        rng = random.Random(331)
+        tree = modules.SearchTree()
+        expected = set()
+        for _ in range(2000):
+            item = rng.randrange(300)
+            if rng.random() < 0.6:
+                self.assertEqual(item not in expected, tree.insert(item))
+                expected.add(item)
+            else:
+                tree.discard(item)
+                expected.discard(item)
+            self.assertEqual(len(expected), len(tree))
+        self.assertEqual(sorted(expected), list(tree))
+        for item in range(300):
+            self.assertEqual(item in expected, item in tree)
+        self.assertBalanced(tree)
+
+    def test_remove_missing(self):
+        """Test that removing a missing item raises KeyError."""
+        tree = modules.SearchTree([1, 2, 3])
+        with self.assertRaises(KeyError):
+            tree.remove(4)
+        self.assertEqual(3, len(tree))
+
+    def test_sequential_inserts_stay_balanced(self):
+        """Test that sorted input does not degrade into a list."""
+        tree = modules.SearchTree(range(1023))
+        self.assertBalanced(tree)
+        self.assertEqual(10, max(len(tree.path(item).replace('ROOT', ''))
+                                 for item in tree) + 1)
+
+    def test_from_sorted(self):
+        """Test bulk loading from sorted items."""
+        tree = modules.SearchTree.from_sorted(range(0, 200, 2))
+        self.assertEqual(list(range(0, 200, 2)), list(tree))
+        self.assertEqual(100, len(tree))
+        self.assertBalanced(tree)
+        tree.insert(51)
+        self.assertIn(51, tree)
+        self.assertBalanced(tree)
+
+    def test_from_sorted_error(self):
+        """Test that unsorted or repeated items are rejected."""
+        for items in [2, 1], [1, 1]:
+            with self.assertRaises(ValueError):
+                modules.SearchTree.from_sorted(items)
+
+    def test_floor_ceiling(self):
+        """Test finding the nearest items on either side of a value."""
+        tree = modules.SearchTree([10, 20, 30])
+        for item, floor, ceiling in ((5, None, 10), (10, 10, 10),
+                                     (15, 10, 20), (30, 30, 30),
+                                     (35, 30, None)):
+            self.assertEqual(floor, tree.floor(item))
+            self.assertEqual(ceiling, tree.ceiling(item))
+
+    def test_range(self):
+        """Test iterating over a half-open range of items."""
+        tree = modules.SearchTree(range(0, 100, 5))
+        self.assertEqual([20, 25, 30], list(tree.range(17, 35)))
+        self.assertEqual([0, 5], list(tree.range(stop=10)))
+        self.assertEqual([90, 95], list(tree.range(90)))
+        self.assertEqual([], list(tree.range(50, 50)))
+        self.assertEqual(list(tree), list(tree.range()))
+
+    def test_tree_functions(self):
+        """Test that the root works with the path-based tree functions."""
+        tree = modules.SearchTree('the quick brown fox jumps over'.split())
+        with test.support.captured_stdout() as stdout:
+            modules.display_tree(tree.root)
+        self.assertEqual(len(tree), len(stdout.getvalue().splitlines()))
+        for item in tree:
+            path = tree.path(item)
+            self.assertEqual(
+                path, modules.breadth_first_search_tree(tree.root, item))
+            self.assertEqual(item,
+                             modules.get_item_from_tree(tree.root, path))
+        self.assertIsNone(tree.path('lazy'))
+
+    def test_index_invalidated(self):
+        """Test that changes to the tree refresh a TreeIndex over it."""
+        tree = modules.SearchTree([2, 1, 3])
+        index = modules.TreeIndex(tree.root)
+        self.assertIsNone(index.search(4))
+        tree.insert(4)
+        self.assertEqual(tree.path(4), index.search(4))
+
+    def test_index_invalidation_cost(self):
+        """Test that changes do not scan the nodes of unrelated indexes."""
+        comparisons = 0
+
+        class CountingNode(modules.BinaryTreeNode):
+            def __eq__(self, other):
+                nonlocal comparisons
+                comparisons += 1
+                return self is other
+
+            __hash__ = modules.BinaryTreeNode.__hash__
+
+        def copy(node):
+            if node is not None:
+                return CountingNode(node.item, copy(node.left),
+                                    copy(node.right))
+
+        index = modules.TreeIndex(copy(modules.create_tree(10)))
+        self.assertEqual('ROOT', index.search(1))
+        tree = modules.SearchTree(range(1 << 8))
+        tree.remove(0)
+        self.assertEqual(0, comparisons)
+        self.assertFalse(index.stale)
+
+
+class TestBoundedSearch(unittest.TestCase):
+    """Test breadth-first searches with limits and many targets."""
+
+    TREE_TYPES = (modules.BinaryTreeNode, modules.CompactTreeNode,
+                  modules.ArrayTree)
+
+    def test_search_tree(self):
+        """Test that one pass finds the same paths as separate searches."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(5, node_type)
+            modules.invert_tree(tree)
+            targets = [1, 7, 19, 31, 32, 'missing']
+            expected = {}
+            for item in targets:
+                path = modules.breadth_first_search_tree(tree, item)
+                if path is not None:
+                    expected[item] = path
+            self.assertEqual(expected, modules.search_tree(tree, targets))
+
+    def test_max_depth(self):
+        """Test that nothing below max_depth is found."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(4, node_type)
+            self.assertEqual('//', modules.breadth_first_search_tree(
+                tree, 3, max_depth=2))
+            self.assertIsNone(modules.breadth_first_search_tree(
+                tree, 4, max_depth=2))
+            self.assertEqual({1: 'ROOT'}, modules.search_tree(
+                tree, [1, 2, 3], max_depth=0))
+
+    def test_max_nodes(self):
+        """Test that only the first max_nodes nodes are looked at."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(4, node_type)
+            # Breadth-first order for this tree starts 1, 2, 9, 3, 6.
+            self.assertEqual('/\\', modules.breadth_first_search_tree(
+                tree, 6, max_nodes=5))
+            self.assertIsNone(modules.breadth_first_search_tree(
+                tree, 6, max_nodes=4))
+            self.assertEqual({2: '/', 9: '\\'}, modules.search_tree(
+                tree, [2, 9, 6], max_nodes=3))
+
+    def test_negative_limits(self):
+        """Test that negative limits are refused before searching."""
+        for node_type in self.TREE_TYPES:
+            tree = modules.create_tree(3, node_type)
+            for limits in {'max_depth': -1}, {'max_nodes': -1}:
+                with self.subTest(node_type=node_type, **limits):
+                    for search in (modules.breadth_first_search_tree,
+                                   modules.search_tree):
+                        with self.assertRaises(ValueError) as cm:
+                            search(tree, [1], **limits)
+                        self.assertEqual(
+                            ('max_depth and max_nodes must not be negative',),
+                            cm.exception.args)
+
+    def test_duplicates(self):
+        """Test that the shortest path wins when an item repeats."""
+        tree = modules.BinaryTreeNode(
+            0,
+            modules.BinaryTreeNode(1, modules.BinaryTreeNode(5)),
+            modules.BinaryTreeNode(5))
+        self.assertEqual({5: '\\'}, modules.search_tree(tree, [5]))
+
+    def test_root_type(self):
+        """Test the type checking in the search_tree function."""
+        with self.assertRaises(TypeError):
+            modules.search_tree(None, [1])
+
+
 class TestHeapQueue(unittest.TestCase):
     """Test the HeapQueue class located in modules."""
 
@@ -563,6 +1357,37 @@ class TestHeapQueue(unittest.TestCase):
                 self.assertEqual(number, instance.pop())
             self.assertEqual(0, len(instance))
 
+    def test_peek(self):
+        """Test that peek shows the next item without removing it."""
+        instance = self.CLASS(self.EXAMPLE.copy())
+        first = max(self.EXAMPLE) if self.REVERSE else min(self.EXAMPLE)
+        self.assertEqual(first, instance.peek())
+        self.assertEqual(len(self.EXAMPLE), len(instance))
+        self.assertEqual(first, instance.pop())
+
+    def test_peek_zero(self):
+        """Test peeking at an empty instance."""
+        with self.assertRaises(IndexError):
+            self.CLASS().peek()
+
+    def test_pushpop(self):
+        """Test that pushpop returns the first of the heap and the item."""
+        instance = self.CLASS([5])
+        low, high = (10, 0) if self.REVERSE else (0, 10)
+        self.assertEqual(low, instance.pushpop(low))
+        self.assertEqual(5, instance.pushpop(high))
+        self.assertEqual(high, instance.pop())
+        self.assertEqual(low, self.CLASS().pushpop(low))
+
+    def test_replace(self):
+        """Test that replace pops before it pushes."""
+        instance = self.CLASS([5])
+        low = 10 if self.REVERSE else 0
+        self.assertEqual(5, instance.replace(low))
+        self.assertEqual(low, instance.pop())
+        with self.assertRaises(IndexError):
+            instance.replace(low)
+
 
 class TestAdvHeapQueue(TestHeapQueue):
     """Test the AdvHeapQueue class located in modules."""
@@ -622,6 +1447,98 @@ class TestAdvHeapQueue(TestHeapQueue):
             counter += 1
         self.assertEqual(0, counter)
 
+    def ordered(self, items):
+        """Sort the items into the order that the instance pops them."""
+        return sorted(items, reverse=self.REVERSE)
+
+    def test_extend_bulk(self):
+        """Test extending with batches larger and smaller than the heap."""
+        rng = random.Random(331)
+        items = [rng.randrange(1000) for _ in range(500)]
+        for split in 0, 50, 450:
+            with self.subTest(split=split):
+                instance = self.CLASS(items[:split])
+                instance.extend(iter(items[split:]))
+                self.assertEqual(len(items), len(instance))
+                self.assertEqual(self.ordered(items), list(instance))
+
+    def test_pop_many(self):
+        """Test popping a few items and then most of the rest."""
+        items = list(range(100))
+        random.Random(331).shuffle(items)
+        instance = self.CLASS(items.copy())
+        expected = self.ordered(items)
+        self.assertEqual(expected[:5], instance.pop_many(5))
+        self.assertEqual(expected[5:90], instance.pop_many(85))
+        self.assertEqual(expected[90:91], [instance.pop()])
+        self.assertEqual(expected[91:], instance.pop_many(100))
+        self.assertEqual([], instance.pop_many(1))
+
+    def test_peek_many(self):
+        """Test looking at the first items without removing them."""
+        instance = self.CLASS(self.EXAMPLE.copy())
+        self.assertEqual(self.ordered(self.EXAMPLE)[:3],
+                         instance.peek_many(3))
+        self.assertEqual([], instance.peek_many(0))
+        self.assertEqual(len(self.EXAMPLE), len(instance))
+
+    def test_sorted_items(self):
+        """Test that the sorted view leaves the instance unchanged."""
+        instance = self.CLASS(self.EXAMPLE.copy())
+        self.assertEqual(self.ordered(self.EXAMPLE), instance.sorted_items())
+        self.assertEqual(self.ordered(self.EXAMPLE), list(instance))
+
+    def test_bulk_custom_push(self):
+        """Test that a subclass overriding push still sees every item."""
+        class CountingQueue(self.CLASS):
+            pushed = 0
+
+            def push(self, item):
+                type(self).pushed += 1
+                return super().push(item)
+
+        self.assertFalse(CountingQueue._bulk_hooks)
+        instance = CountingQueue()
+        instance.extend(self.EXAMPLE)
+        self.assertEqual(len(self.EXAMPLE), CountingQueue.pushed)
+        ordered = self.ordered(self.EXAMPLE)
+        self.assertEqual(ordered[:4], instance.peek_many(4))
+        self.assertEqual(ordered, instance.sorted_items())
+        self.assertEqual(ordered[:2], instance.pop_many(2))
+        self.assertEqual(ordered[2:], list(instance))
+        with self.assertRaises(TypeError):
+            modules.merge_heaps(CountingQueue())
+
+    def test_iter_error(self):
+        """Test that iterating only hides IndexError from an empty heap."""
+        class BrokenQueue(self.CLASS):
+            def pop(self):
+                raise IndexError('pop is broken')
+
+        instance = BrokenQueue()
+        self.assertEqual([], list(instance))
+        instance.push(1)
+        with self.assertRaises(IndexError):
+            list(instance)
+
+    def test_merge_heaps(self):
+        """Test merging several instances into one stream in pop order."""
+        parts = [[5, 1, 9], [], [4, 4, 0, 7], [8]]
+        instances = [self.CLASS(part.copy()) for part in parts]
+        merged = list(modules.merge_heaps(*instances))
+        self.assertEqual(self.ordered(sum(parts, [])), merged)
+        self.assertEqual([len(part) for part in parts],
+                         [len(instance) for instance in instances])
+
+    def test_merge_heaps_type_error(self):
+        """Test that only heaps of one type can be merged."""
+        with self.assertRaises(TypeError):
+            modules.merge_heaps(self.CLASS(), [1, 2])
+        other = modules.KeyHeapQueue \
+            if self.CLASS is modules.AdvHeapQueue else modules.AdvHeapQueue
+        with self.assertRaises(TypeError):
+            modules.merge_heaps(self.CLASS(), other())
+
 
 class TestRevHeapQueue(TestAdvHeapQueue):
     """Test the RevHeapQueue class located in modules."""
@@ -633,6 +1550,661 @@ class TestRevHeapQueue(TestAdvHeapQueue):
     POP_DOC = 'Unwrap each item before returning it to the caller.'
     REVERSE = True
 
+    def test_init_keeps_list(self):
+        """Test that the caller's list is not changed by the initializer."""
+        example = self.EXAMPLE.copy()
+        instance = self.CLASS(example)
+        self.assertEqual(self.EXAMPLE, example)
+        instance.push(100)
+        self.assertEqual(self.EXAMPLE, example)
+
+    def test_non_numeric_items(self):
+        """Test that items which cannot be negated are still reversed."""
+        instance = self.CLASS(list('heap'))
+        instance.push('queue')
+        self.assertEqual(['queue', 'p', 'h', 'e', 'a'], list(instance))
+
+    def test_mixed_numbers(self):
+        """Test that ints, floats, and fractions are ordered together."""
+        instance = self.CLASS([1, 2.5, fractions.Fraction(7, 4), True])
+        self.assertEqual([2.5, fractions.Fraction(7, 4), 1, True],
+                         list(instance))
+
+    def test_non_real_numbers(self):
+        """Test that numbers which are not Real mix with negated ones."""
+        instance = self.CLASS([1, decimal.Decimal(2), 3])
+        instance.push(decimal.Decimal('2.5'))
+        instance.push(0.5)
+        self.assertEqual([3, decimal.Decimal('2.5'), 2, 1, 0.5],
+                         list(instance))
+
+
+class TestKeyHeapQueue(TestAdvHeapQueue):
+    """Test the KeyHeapQueue class located in modules."""
+
+    CLASS = modules.KeyHeapQueue
+    CLASS_DOC = 'Priority Queue ordered by a key function, optionally in ' \
+                'reverse.'
+    INIT_DOC = 'Initialize the KeyHeapQueue instance.'
+    PUSH_DOC = 'Wrap the item with its key before pushing it onto the heap.'
+    POP_DOC = 'Unwrap each item before returning it to the caller.'
+
+    def test_key(self):
+        """Test that items come out in the order of their keys."""
+        instance = self.CLASS([-3, 1, -2], key=abs)
+        instance.push(0)
+        self.assertEqual([0, 1, -2, -3], list(instance))
+
+    def test_reverse(self):
+        """Test that reverse pops the item with the largest key first."""
+        instance = self.CLASS(['bb', 'a', 'dddd'], key=len, reverse=True)
+        instance.push('ccc')
+        self.assertEqual(['dddd', 'ccc', 'bb', 'a'], list(instance))
+
+    def test_stable(self):
+        """Test that items with equal keys come out in arrival order."""
+        items = [{'id': index, 'rank': index % 3, 'name': 'abc'[index % 3]}
+                 for index in range(12)]
+        for field in 'rank', 'name':
+            for reverse in False, True:
+                with self.subTest(field=field, reverse=reverse):
+                    key = operator.itemgetter(field)
+                    instance = self.CLASS(items, key=key, reverse=reverse)
+                    expected = sorted(items, key=key, reverse=reverse)
+                    self.assertEqual(expected, list(instance))
+
+    def test_init_keeps_list(self):
+        """Test that the caller's list is not changed by the initializer."""
+        example = self.EXAMPLE[::-1]
+        self.CLASS(example, key=abs)
+        self.assertEqual(self.EXAMPLE[::-1], example)
+
+    def test_merge_heaps_ordering(self):
+        """Test that only heaps with the same key and reverse are merged."""
+        parts = [[-3, 1], [2, -4]]
+        merged = modules.merge_heaps(*(self.CLASS(part, key=abs, reverse=True)
+                                       for part in parts))
+        self.assertEqual([-4, -3, 2, 1], list(merged))
+        for kwargs in {'key': abs, 'reverse': False}, {'reverse': True}:
+            with self.subTest(**kwargs), self.assertRaises(TypeError):
+                modules.merge_heaps(self.CLASS(key=abs, reverse=True),
+                                    self.CLASS(**kwargs))
+
+
+class TestIndexedHeapQueue(TestAdvHeapQueue):
+    """Test the IndexedHeapQueue class located in modules."""
+
+    CLASS = modules.IndexedHeapQueue
+    CLASS_DOC = 'Priority Queue whose items can be changed or removed by ' \
+                'handle.'
+    INIT_DOC = 'Initialize the IndexedHeapQueue instance.'
+    PUSH_DOC = 'Add an item to the heap and return a handle that refers to it.'
+
+    def test_handles(self):
+        """Test that pushed items can be found by their handles."""
+        instance = self.CLASS()
+        handle = instance.push(3)
+        self.assertIsInstance(handle, modules.HeapHandle)
+        self.assertIn(handle, instance)
+        self.assertNotIn(3, instance)
+        self.assertEqual(3, instance.pop())
+        self.assertNotIn(handle, instance)
+
+    def test_backend(self):
+        """Test that the backend property reports the heap's handles."""
+        instance = self.CLASS([4, 2, 7])
+        handle = instance.push(1)
+        backend = instance.backend
+        self.assertIs(handle, backend[0])
+        self.assertEqual([1, 2, 4, 7], sorted(item.item for item in backend))
+        with self.assertRaises(TypeError):
+            self.CLASS([], backend=modules.BinaryHeap)
+
+    def test_decrease_key(self):
+        """Test that lowering an item moves it to the front."""
+        instance = self.CLASS(list(range(10, 20)))
+        handle = instance.push(25)
+        instance.decrease_key(handle, 5)
+        self.assertEqual(5, instance.peek())
+        with self.assertRaises(ValueError):
+            instance.decrease_key(handle, 30)
+
+    def test_increase_key(self):
+        """Test that raising an item moves it toward the back."""
+        instance = self.CLASS()
+        handles = [instance.push(item) for item in range(10)]
+        instance.increase_key(handles[0], 100)
+        self.assertEqual(list(range(1, 10)) + [100], list(instance))
+        with self.assertRaises(ValueError):
+            instance.increase_key(handles[1], 0)
+
+    def test_remove(self):
+        """Test removing items from the middle of the heap."""
+        instance = self.CLASS()
+        handles = [instance.push(item) for item in range(20)]
+        for handle in handles[::3]:
+            self.assertEqual(handle.item, instance.remove(handle))
+        self.assertEqual([item for item in range(20) if item % 3],
+                         list(instance))
+        with self.assertRaises(ValueError):
+            instance.remove(handles[0])
+
+    def test_random_operations(self):
+        """Test a mix of operations against a sorted list."""
+        rng = random.Random(331)
+        instance = self.CLASS()
+        live = []
+        for _ in range(3000):
+            action = rng.random()
+            if action < 0.4 or not live:
+                live.append(instance.push(rng.randrange(1000)))
+            elif action < 0.6:
+                handle = live.pop(rng.randrange(len(live)))
+                instance.remove(handle)
+            elif action < 0.8:
+                instance.update(rng.choice(live), rng.randrange(1000))
+            else:
+                item = instance.pop()
+                self.assertEqual(min(handle.item for handle in live), item)
+                live = [handle for handle in live if handle in instance]
+            self.assertEqual(len(live), len(instance))
+        self.assertEqual(sorted(handle.item for handle in live),
+                         list(instance))
+
+
+class TestExternalHeapQueue(TestAdvHeapQueue):
+    """Test the ExternalHeapQueue class located in modules."""
+
+    CLASS = modules.ExternalHeapQueue
+    CLASS_DOC = 'Priority Queue that spills sorted runs to disk when it ' \
+                'grows large.'
+    INIT_DOC = 'Initialize the ExternalHeapQueue instance.'
+    PUSH_DOC = 'Add an item to the heap, spilling to disk when memory is ' \
+               'full.'
+
+    @staticmethod
+    def random_items(count):
+        """Make a list of random items with plenty of duplicates."""
+        rng = random.Random(331)
+        return [rng.randrange(count // 2) for _ in range(count)]
+
+    def test_spill(self):
+        """Test that a small memory limit spreads items over many runs."""
+        items = self.random_items(5000)
+        with self.CLASS(memory_limit=100, max_runs=4) as instance:
+            for item in items:
+                instance.push(item)
+            self.assertEqual(len(items), len(instance))
+            self.assertLessEqual(instance.run_count, 5)
+            self.assertGreater(len(os.listdir(instance.directory)), 1)
+            self.assertEqual(sorted(items)[:50], instance.peek_many(50))
+            self.assertEqual(sorted(items), instance.sorted_items())
+            self.assertEqual(sorted(items)[:10], instance.pop_many(10))
+            instance.extend(range(-5, 0))
+            self.assertEqual(-5, instance.peek())
+            self.assertEqual(list(range(-5, 0)) + sorted(items)[10:],
+                             list(instance))
+            self.assertFalse(instance)
+        self.assertFalse(os.path.exists(instance.directory))
+
+    def test_backend(self):
+        """Test that the backend holds only the entries in memory."""
+        with self.CLASS(list(range(250)), memory_limit=100,
+                        backend=modules.DaryHeap) as instance:
+            self.assertIsInstance(instance.backend, modules.DaryHeap)
+            self.assertEqual(50, len(instance.backend))
+            self.assertEqual(250, len(instance))
+            self.assertEqual(list(range(250)), list(instance))
+
+    def test_merge_heaps_lazily(self):
+        """Test that merge_heaps reads the spilled runs as it goes."""
+        items = self.random_items(1000)
+        with self.CLASS(items[:500], memory_limit=100) as first, \
+                self.CLASS(items[500:], memory_limit=100) as second:
+            with unittest.mock.patch.object(
+                    self.CLASS, '_sorted', side_effect=AssertionError):
+                merged = modules.merge_heaps(first, second)
+                self.assertEqual(sorted(items), list(merged))
+            self.assertEqual(1000, len(first) + len(second))
+
+    def test_limit_errors(self):
+        """Test that the memory limit and run count are checked."""
+        with self.assertRaises(ValueError):
+            self.CLASS(memory_limit=0)
+        with self.assertRaises(ValueError):
+            self.CLASS(max_runs=1)
+
+    def test_durable(self):
+        """Test that a flushed queue can be reopened from its directory."""
+        items = self.random_items(3000)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.CLASS(items, 200, directory) as instance:
+                popped = instance.pop_many(1000)
+            with self.CLASS(memory_limit=200,
+                            directory=directory) as instance:
+                self.assertEqual(2000, len(instance))
+                self.assertEqual(sorted(items), popped + list(instance))
+            with self.CLASS(directory=directory) as instance:
+                self.assertFalse(instance)
+            self.assertEqual([modules._MANIFEST_NAME],
+                             os.listdir(directory))
+
+    def test_unflushed_runs(self):
+        """Test that runs written after the last flush are dropped."""
+        with tempfile.TemporaryDirectory() as directory:
+            instance = self.CLASS(list(range(10)), 4, directory)
+            instance.flush()
+            instance.extend(range(10, 20))
+            del instance
+            with self.CLASS(directory=directory) as instance:
+                self.assertEqual(list(range(10)), list(instance))
+
+
+class TestScheduler(unittest.TestCase):
+    """Test the Scheduler class located in modules."""
+
+    # Jobs may run this much after their deadline, but never before it.
+    LATENESS = 0
+
+    def setUp(self):
+        """Give every test a clock that only moves when it is told to."""
+        self.now = 0.0
+        self.instance = self.create(lambda: self.now)
+
+    def create(self, clock):
+        """Make the instance under test with the given clock."""
+        return modules.Scheduler(clock)
+
+    def test_empty(self):
+        """Test that an empty instance has nothing to run."""
+        self.assertEqual(0, len(self.instance))
+        self.assertIsNone(self.instance.next_deadline())
+        self.assertEqual(0, self.instance.run_pending(100))
+
+    def test_run_in_order(self):
+        """Test that due jobs run in order of their deadlines."""
+        ran = []
+        for at in 3, 1, 2, 7:
+            self.instance.schedule(at, ran.append, at)
+        job = self.instance.schedule_after(5, ran.append, 5)
+        self.assertIsInstance(job, modules.ScheduledJob)
+        self.assertEqual(1, self.instance.next_deadline())
+        self.assertEqual(4, self.instance.run_pending(5 + self.LATENESS))
+        self.assertEqual([1, 2, 3, 5], ran)
+        self.assertEqual(1, len(self.instance))
+        self.assertEqual(7, self.instance.next_deadline())
+
+    def test_cancel(self):
+        """Test that cancelled jobs never run and only cancel once."""
+        ran = []
+        jobs = [self.instance.schedule(at, ran.append, at)
+                for at in range(300)]
+        for job in jobs[:250]:
+            self.assertTrue(self.instance.cancel(job))
+        self.assertFalse(self.instance.cancel(jobs[0]))
+        self.assertEqual(50, len(self.instance))
+        self.assertEqual(250, self.instance.next_deadline())
+        self.now = 1000
+        self.assertEqual(50, self.instance.run_pending())
+        self.assertEqual(list(range(250, 300)), ran)
+        self.assertFalse(self.instance.cancel(jobs[-1]))
+
+    def test_random_operations(self):
+        """Test that jobs run on time however they are mixed together."""
+        rng = random.Random(331)
+        ran = []
+        jobs = []
+        for _ in range(40):
+            for _ in range(rng.randrange(50)):
+                job = self.instance.schedule_after(rng.uniform(0, 20) ** 2,
+                                                   ran.append)
+                job.args = job,
+                jobs.append(job)
+            for job in rng.sample(jobs, len(jobs) // 10):
+                self.instance.cancel(job)
+            self.now += rng.uniform(0, 10)
+            self.instance.run_pending()
+            for job in ran:
+                self.assertLessEqual(job.deadline, self.now)
+            waiting = [job.deadline for job in jobs if not job.cancelled]
+            for deadline in waiting:
+                self.assertGreater(deadline, self.now - self.LATENESS)
+            self.assertEqual(len(waiting), len(self.instance))
+            self.assertEqual(min(waiting, default=None),
+                             self.instance.next_deadline())
+        self.assertEqual(len(ran), len(set(map(id, ran))))
+
+
+class TestTimerWheel(TestScheduler):
+    """Test the TimerWheel class located in modules."""
+
+    LATENESS = 0.01
+
+    def create(self, clock):
+        """Make a small wheel so that the tests reach every level."""
+        return modules.TimerWheel(0.01, 8, 2, clock)
+
+    def test_far_future(self):
+        """Test jobs beyond every level of the wheel."""
+        ran = []
+        self.instance.schedule(1e6, ran.append, 'far')
+        self.instance.schedule(0.5, ran.append, 'near')
+        self.assertEqual(0.5, self.instance.next_deadline())
+        self.assertEqual(1, self.instance.run_pending(1))
+        self.assertEqual(1e6, self.instance.next_deadline())
+        self.assertEqual(0, self.instance.run_pending(1e6 - 1))
+        self.assertEqual(1, self.instance.run_pending(1e6 + 1))
+        self.assertEqual(['near', 'far'], ran)
+
+    def test_shared_tick(self):
+        """Test far away jobs that round up to the same tick."""
+        ran = []
+        self.instance.schedule(1e6 + 0.005, ran.append, 'later')
+        self.instance.schedule(1e6 + 0.001, ran.append, 'sooner')
+        self.assertEqual(1e6 + 0.001, self.instance.next_deadline())
+        self.assertEqual(2, self.instance.run_pending(1e6 + 1))
+        self.assertEqual(['sooner', 'later'], ran)
+
+    def test_errors(self):
+        """Test that the size of the wheel is checked."""
+        with self.assertRaises(ValueError):
+            modules.TimerWheel(0)
+        with self.assertRaises(ValueError):
+            modules.TimerWheel(slots=1)
+        with self.assertRaises(ValueError):
+            modules.TimerWheel(levels=0)
+
+
+class TestBinaryHeap(unittest.TestCase):
+    """Test the BinaryHeap class located in modules."""
+
+    BACKEND = modules.BinaryHeap
+
+    def test_empty(self):
+        """Test that an empty backend cannot be popped or peeked at."""
+        backend = self.BACKEND()
+        self.assertEqual(0, len(backend))
+        with self.assertRaises(IndexError):
+            backend.pop()
+        with self.assertRaises(IndexError):
+            backend.peek()
+        with self.assertRaises(IndexError):
+            backend.replace(1)
+        self.assertEqual(1, backend.pushpop(1))
+
+    def test_initial_items(self):
+        """Test that the initial items are put into heap order."""
+        backend = self.BACKEND([5, 3, 8, 1, 9, 2, 7])
+        self.assertEqual(7, len(backend))
+        self.assertEqual([1, 2, 3, 5, 7, 8, 9], sorted(backend))
+        self.assertEqual([1, 2, 3], backend.peek_many(3))
+        self.assertEqual([1, 2, 3, 5, 7, 8, 9], backend.pop_many(10))
+
+    def test_pushpop_and_replace(self):
+        """Test that pushpop and replace act like heapq's versions."""
+        backend = self.BACKEND([4, 6])
+        self.assertEqual(2, backend.pushpop(2))
+        self.assertEqual(4, backend.pushpop(5))
+        self.assertEqual(5, backend.replace(1))
+        self.assertEqual([1, 6], backend.pop_many(2))
+
+    def test_random_operations(self):
+        """Test a mix of operations against a sorted list."""
+        rng = random.Random(331)
+        backend = self.BACKEND()
+        expected = []
+        for _ in range(3000):
+            action = rng.random()
+            if action < 0.45 or not expected:
+                item = rng.randrange(500)
+                backend.push(item)
+                expected.append(item)
+            elif action < 0.5:
+                items = [rng.randrange(500)
+                         for _ in range(rng.randrange(200))]
+                backend.extend(items)
+                expected.extend(items)
+            elif action < 0.55:
+                count = rng.randrange(len(expected) + 1)
+                expected.sort()
+                self.assertEqual(expected[:count], backend.pop_many(count))
+                del expected[:count]
+            else:
+                expected.sort()
+                self.assertEqual(expected.pop(0), backend.pop())
+            self.assertEqual(len(expected), len(backend))
+            if expected:
+                self.assertEqual(min(expected), backend.peek())
+
+    def test_heap_queues(self):
+        """Test that the heap queues accept the backend."""
+        for heap_type, expected in ((modules.HeapQueue, [1, 2, 3]),
+                                    (modules.AdvHeapQueue, [1, 2, 3]),
+                                    (modules.RevHeapQueue, [3, 2, 1])):
+            with self.subTest(heap_type=heap_type):
+                instance = heap_type([2, 3], backend=self.BACKEND)
+                self.assertIsInstance(instance.backend, modules.HeapBackend)
+                instance.push(1)
+                self.assertEqual(expected,
+                                 [instance.pop() for _ in range(3)])
+
+
+class TestDaryHeap(TestBinaryHeap):
+    """Test the DaryHeap class located in modules."""
+
+    BACKEND = modules.DaryHeap
+
+    def test_arity(self):
+        """Test heaps with arities from two to nine."""
+        items = list(range(100))
+        random.Random(331).shuffle(items)
+        for arity in range(2, 10):
+            with self.subTest(arity=arity):
+                backend = self.BACKEND(items.copy(), arity)
+                self.assertEqual(arity, backend.arity)
+                self.assertEqual(list(range(100)), backend.pop_many(30) +
+                                 [backend.pop() for _ in range(70)])
+
+    def test_arity_error(self):
+        """Test that the arity has to be an int of at least two."""
+        with self.assertRaises(TypeError):
+            self.BACKEND(arity=2.0)
+        with self.assertRaises(ValueError):
+            self.BACKEND(arity=1)
+
+
+class TestPairingHeap(TestBinaryHeap):
+    """Test the PairingHeap class located in modules."""
+
+    BACKEND = modules.PairingHeap
+
+    def test_backend_type_error(self):
+        """Test that a backend factory has to make a HeapBackend."""
+        with self.assertRaises(TypeError):
+            modules.HeapQueue(backend=list)
+
+
+class TestInstrumentedHeap(TestBinaryHeap):
+    """Test the InstrumentedHeap class located in modules."""
+
+    BACKEND = modules.InstrumentedHeap
+
+    def test_stats(self):
+        """Test the counts after a few pushes and pops."""
+        backend = self.BACKEND([3, 1, 2])
+        backend.push(0)
+        backend.extend([5, 4])
+        self.assertEqual(0, backend.pop())
+        self.assertEqual([1, 2], backend.pop_many(2))
+        stats = backend.stats()
+        self.assertIsInstance(stats, modules.HeapStats)
+        self.assertEqual((3, 6, 3, 3), stats[:4])
+        self.assertGreater(stats.comparisons, 0)
+        self.assertEqual({'push': 1, 'extend': 1, 'pop': 1, 'pop_many': 1},
+                         stats.calls)
+        self.assertEqual(stats.calls.keys(), stats.seconds.keys())
+        backend.reset()
+        self.assertEqual((3, 3, 0, 0, 0, {}, {}), backend.stats())
+
+    def test_comparisons(self):
+        """Test that every comparison the backend makes is counted."""
+        compared = []
+
+        class Item(int):
+            def __lt__(self, other):
+                compared.append(self)
+                return int(self) < int(other)
+
+        for backend in modules.BinaryHeap, modules.PairingHeap:
+            with self.subTest(backend=backend):
+                compared.clear()
+                instance = self.BACKEND(backend=backend)
+                for item in random.Random(331).sample(range(200), 200):
+                    instance.push(Item(item))
+                self.assertEqual(list(range(200)),
+                                 [instance.pop() for _ in range(200)])
+                self.assertEqual(len(compared),
+                                 instance.stats().comparisons)
+
+    def test_reverse_comparisons(self):
+        """Test that comparisons of _Reverse wrappers are counted too."""
+        instance = modules.RevHeapQueue(list('heap'),
+                                        backend=self.BACKEND)
+        self.assertEqual(list('phea'), list(instance))
+        stats = instance.backend.stats()
+        self.assertGreater(stats.comparisons, 0)
+        self.assertEqual(4, stats.popped)
+
+
+class TestThreadHeapQueue(unittest.TestCase):
+    """Test the ThreadHeapQueue class located in modules."""
+
+    CLASS = modules.ThreadHeapQueue
+
+    def test_priority_order(self):
+        """Test that items come out smallest first by default."""
+        instance = self.CLASS()
+        for item in 5, 1, 4, 2, 3:
+            instance.put(item)
+        self.assertEqual([1, 2, 3, 4, 5],
+                         [instance.get() for _ in range(5)])
+
+    def test_reverse_order(self):
+        """Test that a RevHeapQueue factory puts the largest item first."""
+        instance = self.CLASS(heap_type=modules.RevHeapQueue)
+        for item in 5, 1, 4, 2, 3:
+            instance.put_nowait(item)
+        self.assertEqual([5, 4, 3, 2, 1],
+                         [instance.get_nowait() for _ in range(5)])
+
+    def test_heap_type_error(self):
+        """Test that the factory has to make a heap queue."""
+        with self.assertRaises(TypeError):
+            self.CLASS(heap_type=list)
+
+    def test_timeouts(self):
+        """Test that full queues block puts and empty ones block gets."""
+        instance = self.CLASS(maxsize=2)
+        instance.put(1)
+        instance.put(2)
+        self.assertTrue(instance.full())
+        with self.assertRaises(queue.Full):
+            instance.put(3, timeout=0.01)
+        instance.get()
+        instance.get()
+        with self.assertRaises(queue.Empty):
+            instance.get(timeout=0.01)
+
+    def test_producers_and_consumers(self):
+        """Test several threads sharing one bounded queue."""
+        instance = self.CLASS(maxsize=8)
+        results = []
+        lock = threading.Lock()
+        # The stop marker sorts after every real item, so it comes out last.
+        stop = 1000
+
+        def produce(start):
+            for item in range(start, 1000, 4):
+                instance.put(item)
+
+        def consume():
+            while True:
+                item = instance.get()
+                if item == stop:
+                    instance.task_done()
+                    return
+                with lock:
+                    results.append(item)
+                instance.task_done()
+
+        consumers = [threading.Thread(target=consume) for _ in range(3)]
+        producers = [threading.Thread(target=produce, args=(start,))
+                     for start in range(4)]
+        for thread in consumers + producers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        instance.join()
+        for _ in consumers:
+            instance.put(stop)
+        for thread in consumers:
+            thread.join()
+        self.assertEqual(list(range(1000)), sorted(results))
+
+
+class TestAsyncHeapQueue(unittest.IsolatedAsyncioTestCase):
+    """Test the AsyncHeapQueue class located in modules."""
+
+    CLASS = modules.AsyncHeapQueue
+
+    async def test_priority_order(self):
+        """Test that items come out in the order of the heap factory."""
+        for heap_type, expected in ((modules.AdvHeapQueue, [1, 2, 3]),
+                                    (modules.RevHeapQueue, [3, 2, 1])):
+            with self.subTest(heap_type=heap_type):
+                instance = self.CLASS(heap_type=heap_type)
+                for item in 2, 3, 1:
+                    await instance.put(item)
+                self.assertEqual(expected,
+                                 [await instance.get() for _ in range(3)])
+
+    async def test_repr(self):
+        """Test that showing the queue does not empty it."""
+        instance = self.CLASS()
+        for item in 2, 3, 1:
+            instance.put_nowait(item)
+        self.assertIn('_queue=[1, 2, 3]', repr(instance))
+        self.assertEqual(3, instance.qsize())
+
+    async def test_backpressure(self):
+        """Test that a full queue makes put wait for a get."""
+        instance = self.CLASS(maxsize=1)
+        await instance.put(1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(instance.put(2), 0.01)
+        self.assertEqual(1, await instance.get())
+
+    async def test_producers_and_consumers(self):
+        """Test several tasks sharing one bounded queue."""
+        instance = self.CLASS(maxsize=8, heap_type=modules.RevHeapQueue)
+        results = []
+
+        async def produce(start):
+            for item in range(start, 400, 4):
+                await instance.put(item)
+
+        async def consume():
+            while True:
+                results.append(await instance.get())
+                instance.task_done()
+
+        consumers = [asyncio.create_task(consume()) for _ in range(3)]
+        await asyncio.gather(*map(produce, range(4)))
+        await instance.join()
+        for task in consumers:
+            task.cancel()
+        self.assertEqual(list(range(400)), sorted(results))
+
 
 if __name__ == '__main__':
     unittest.main()
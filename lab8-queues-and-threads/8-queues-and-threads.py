@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 # noinspection GrazieInspection
 
+import array
 import collections
 import csv
 import datetime
+import io
 import itertools
+import math
+import multiprocessing
+import operator
 import pathlib
 import queue
 import random
@@ -13,6 +18,7 @@ import statistics
 import sys
 import textwrap
 import threading
+import time
 
 # Public Names
 __all__ = (
@@ -55,23 +61,37 @@ What did you like best about the course?
 What suggestions do you have for improving the course?'''.splitlines())
 
 
-def main():
+def main(use_processes=False):
     """Read a data file, process its records, and display the needed output."""
-    nri_queue = queue.SimpleQueue()
-    nsi_queue = queue.SimpleQueue()
-    tsi_queue = queue.SimpleQueue()
-    reader = ReadCsvFile(DATA_FILE, HEADERS, (nri_queue, nsi_queue, tsi_queue))
-    nro_queue = queue.SimpleQueue()
-    nso_queue = queue.SimpleQueue()
-    tso_queue = queue.SimpleQueue()
-    nr_generator = GenerateNumericResponses(HEADERS, nri_queue, nro_queue)
-    ns_generator = GenerateNumericResponses(HEADERS, nsi_queue, nso_queue)
-    ts_generator = GenerateNumericResponses(HEADERS, tsi_queue, tso_queue)
+    # With use_processes, the record processors each run in a process of
+    # their own so that their work is not serialized by the GIL; reading
+    # and printing are mostly I/O and stay as threads in this process.
+    make_queue = multiprocessing.Queue if use_processes else queue.SimpleQueue
+    make_processor = _ProcessRunner if use_processes else _call
+    nri_queue = make_queue()
+    nsi_queue = make_queue()
+    tsi_queue = make_queue()
+    reader = ReadCsvFile(DATA_FILE, HEADERS, (nri_queue, nsi_queue, tsi_queue),
+                         columnar=True)
+    nro_queue = make_queue()
+    nso_queue = make_queue()
+    tso_queue = make_queue()
+    nr_generator = make_processor(GenerateNumericResponses,
+                                  HEADERS, nri_queue, nro_queue)
+    ns_generator = make_processor(GenerateNumericResponses,
+                                  HEADERS, nsi_queue, nso_queue)
+    ts_generator = make_processor(GenerateNumericResponses,
+                                  HEADERS, tsi_queue, tso_queue)
     printer = PrintSpooler((nro_queue, nso_queue, tso_queue))
     for thread in reader, nr_generator, ns_generator, ts_generator, printer:
         thread.start()
 
 
+def _call(function, *args):
+    """Call the function with the arguments and return its result."""
+    return function(*args)
+
+
 class _NamedHolyThread(threading.Thread):
     """A base class that names the thread and sets daemon to False."""
 
@@ -83,48 +103,157 @@ class _NamedHolyThread(threading.Thread):
         super().__init__(name=f'{name}-{self.COUNTER[name]()}', daemon=False)
 
 
+class _ProcessRunner(multiprocessing.Process):
+    """A process that creates a _DataProcessor and runs it in the child."""
+
+    def __init__(self, processor_type, *args):
+        """Initialize the _ProcessRunner instance."""
+        name = processor_type.__name__
+        super().__init__(name=f'{name}Process-'
+                              f'{_NamedHolyThread.COUNTER[name]()}',
+                         daemon=False)
+        self.__processor_type = processor_type
+        self.__args = args
+
+    def run(self):
+        """Run the processor's thread body directly in this process."""
+        self.__processor_type(*self.__args).run()
+
+
+class _EndOfData:
+    """The marker that ends a queue, and stays unique when it is pickled."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        """Name the marker when it is shown."""
+        return 'END_OF_DATA'
+
+    def __reduce__(self):
+        """Unpickle as the module's own marker instead of a new copy."""
+        return '_END_OF_DATA'
+
+
+_END_OF_DATA = _EndOfData()
+
+
 class ReadCsvFile(_NamedHolyThread):
     """A class that can read CSV files and send records to multiple queues."""
 
-    def __init__(self, file_path, headers, output_queues):
+    CHUNK_SIZE = 256
+    FLUSH_INTERVAL = 0.05  # Keep this below _DataProcessor.ITERATOR_TIMEOUT.
+
+    def __init__(self, file_path, headers, output_queues,
+                 chunk_size=CHUNK_SIZE, flush_interval=FLUSH_INTERVAL,
+                 columnar=False):
         """Initialize the ReadCsvFile instance."""
         super().__init__()
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least one')
         self.__file_path = file_path
         self.__headers = headers
         self.__output_queues = output_queues
+        self.__chunk_size = chunk_size
+        self.__flush_interval = flush_interval
+        self.__columnar = columnar
+        self.__get_values = None
+        self.__converters = None
 
     def run(self):
         """Generate records from the CSV file and send them to the queues."""
         try:
             with self.__file_path.open(newline='') as source:
-                for row in csv.DictReader(source):
-                    record = self.__create_record(row)
-                    for destination in self.__output_queues:
-                        destination.put(record)
+                rows = csv.reader(source)
+                self.__prepare_columns(next(rows, ()))
+                records = []
+                deadline = None
+                for row in rows:
+                    records.append(self.__create_record(row))
+                    if deadline is None:
+                        deadline = time.monotonic() + self.__flush_interval
+                    if len(records) >= self.__chunk_size \
+                            or time.monotonic() >= deadline:
+                        self.__send(records)
+                        records = []
+                        deadline = None
+                self.__send(records)
         finally:
             for destination in self.__output_queues:
                 destination.put(_DataProcessor.END_OF_DATA)
 
-    def __create_record(self, row):
-        """Clean up a row so that it can be used in the rest of the program."""
-        record = {}
+    def __send(self, records):
+        """Share one chunk of records with every output queue at once."""
+        if records:
+            if self.__columnar:
+                chunk = self.__pack_columns(records)
+            else:
+                chunk = _RecordChunk(records)
+            for destination in self.__output_queues:
+                destination.put(chunk)
+
+    def __pack_columns(self, records):
+        """Turn a batch of records into one packed sequence per header."""
+        return _ColumnChunk(
+            _pack_numbers(column) if converter is int else column
+            for converter, column in zip(self.__converters, zip(*records)))
+
+    def __prepare_columns(self, header_row):
+        """Find each header's column and how to convert it just once."""
+        indices, converters = [], []
         for header in self.__headers:
-            for key in row:
+            for index, key in enumerate(header_row):
                 if key.endswith(header):
                     break
             else:
                 raise KeyError(f'{header!r} not found')
-            value = row[key]
-            try:
-                value = int(value)
-                assert header.endswith(_DataProcessor.NUMERIC_SUFFIX), \
-                    'textual data confused for numeric data'
-            except ValueError:
-                value = ' '.join(value.split())
-                assert header.endswith(_DataProcessor.TEXTUAL_SUFFIX), \
-                    'numeric data confused for textual data'
-            record[header] = value
-        return record
+            if header.endswith(_DataProcessor.NUMERIC_SUFFIX):
+                converter = int
+            elif header.endswith(_DataProcessor.TEXTUAL_SUFFIX):
+                converter = self.__clean_text
+            else:
+                raise ValueError(f'{header!r} is neither numeric nor textual')
+            indices.append(index)
+            converters.append(converter)
+        # itemgetter only returns a tuple when it is given several indices.
+        self.__get_values = operator.itemgetter(*indices) \
+            if len(indices) > 1 else lambda row: (row[indices[0]],)
+        self.__converters = converters
+
+    def __create_record(self, row):
+        """Clean up a row so that it can be used in the rest of the program."""
+        # The record is a tuple of values in the same order as the headers.
+        return tuple(convert(value) for convert, value
+                     in zip(self.__converters, self.__get_values(row)))
+
+    @staticmethod
+    def __clean_text(value):
+        """Collapse all of the whitespace in a textual value."""
+        return ' '.join(value.split())
+
+
+class _RecordChunk(tuple):
+    """An immutable batch of records that is shared by all the consumers."""
+
+    __slots__ = ()
+
+
+class _ColumnChunk(tuple):
+    """An immutable batch of records that is stored one column at a time."""
+
+    __slots__ = ()
+
+
+_TYPECODES = 'bhq'  # int8 and int16 cover the survey answers; int64 is spare.
+
+
+def _pack_numbers(values):
+    """Store the integers in the smallest array type that can hold them."""
+    low, high = min(values), max(values)
+    for typecode in _TYPECODES:
+        limit = 1 << array.array(typecode).itemsize * 8 - 1
+        if -limit <= low and high < limit:
+            return array.array(typecode, values)
+    return values
 
 
 # noinspection GrazieInspection
@@ -133,8 +262,8 @@ class _DataProcessor(_NamedHolyThread):
 
     NUMERIC_SUFFIX = ':'
     TEXTUAL_SUFFIX = '?'
-    END_OF_DATA = object()
-    ITERATOR_TIMEOUT = 0.1
+    END_OF_DATA = _END_OF_DATA
+    ITERATOR_TIMEOUT = 5.0
     SECTION_HEADER = None  # Override in all child classes.
     DIVIDER_LENGTH = None  # Override in all child classes.
 
@@ -163,6 +292,26 @@ class _DataProcessor(_NamedHolyThread):
 
     def __iter__(self):
         """Allow queue records to be easily retrieved."""
+        for item in self.__items():
+            if type(item) is _RecordChunk:
+                yield from item
+            elif type(item) is _ColumnChunk:
+                yield from zip(*item)
+            else:
+                yield item
+
+    def iter_columns(self):
+        """Yield batches of records with one sequence for each column."""
+        for item in self.__items():
+            if type(item) is _ColumnChunk:
+                yield item
+            elif type(item) is _RecordChunk:
+                yield tuple(zip(*item))
+            else:
+                yield tuple(zip(item))
+
+    def __items(self):
+        """Yield the items from the input queue until END_OF_DATA arrives."""
         while True:
             item = self.get_item(self.__input_queue)
             # If the item is self.END_OF_DATA, then break out of the loop.
@@ -189,10 +338,19 @@ class _DataProcessor(_NamedHolyThread):
         """Send the arguments and keyword arguments to the print queue."""
         self.__output_queue.put((args, kwargs))
 
+    def write(self, text):
+        """Send text that is already rendered, line ends and all, to print."""
+        if text:
+            self.__output_queue.put(text)
+
     def get_numeric_headers(self):
         """Assist with getting the names for the numeric columns."""
         return self.get_items_ending_with(self.__headers, self.NUMERIC_SUFFIX)
 
+    def get_index(self, name):
+        """Find where a column's value is kept in each record."""
+        return self.__headers.index(name)
+
     @staticmethod
     def get_items_ending_with(iterable, suffix):
         """Yield back those items that end with the provided suffix."""
@@ -214,7 +372,8 @@ class _DataProcessor(_NamedHolyThread):
 
     def get_column(self, name):
         """Assist with getting all of the values from a particular column."""
-        return [record[name] for record in self.__records]
+        index = self.get_index(name)
+        return [record[index] for record in self.__records]
 
     @property
     def __records(self):
@@ -240,15 +399,40 @@ class GenerateNumericResponses(_DataProcessor):
     def process_data(self):
         """Generate formatted print data for each record from the CSV file."""
         self.show_section_header()
-        for record in self:
-            values = []
-            for key in self.get_numeric_headers():
-                values.append(record[key])
-                self.print(f'{key:68}{values[-1]}')
-            mean, cv = self.calculate_mean_and_cv(values)
-            self.print(f'{"Arithmetic Mean:":64}{mean:.3f}')
-            self.print(f'{"Coefficient of Variation:":64}{cv:.3f}')
-            self.show_record_break()
+        keys = tuple(self.get_numeric_headers())
+        indices = [self.get_index(key) for key in keys]
+        # Every record's block is rendered by one printf-style call (about
+        # twice as fast as str.format here), and each batch of blocks is
+        # sent to the PrintSpooler as a single message.
+        template = '\n'.join(itertools.chain(
+            (f'{key:68}'.replace('%', '%%') + '%d' for key in keys),
+            (f'{"Arithmetic Mean:":64}%.3f',
+             f'{"Coefficient of Variation:":64}%.3f',
+             f'{"=" * self.DIVIDER_LENGTH}\n\n')))
+        for batch in self.iter_columns():
+            columns = [batch[index] for index in indices]
+            self.write(''.join(
+                template % (*row, mean, cv) for row, (mean, cv) in zip(
+                    zip(*columns), self.calculate_means_and_cvs(columns))))
+
+    @staticmethod
+    def calculate_means_and_cvs(columns):
+        """Calculate the mean and coefficient of variation for each row."""
+        count = len(columns)
+        if count < 2:
+            raise statistics.StatisticsError(
+                'stdev requires at least two data points')
+        # The per-row sums are taken across whole columns at once, and stay
+        # exact for integers until the final division and square root.
+        totals = map(sum, zip(*columns))
+        squares = map(sum, zip(*(map(operator.mul, column, column)
+                                 for column in columns)))
+        results = []
+        for total, square in zip(totals, squares):
+            mean = total / count
+            variance = (square * count - total * total) / (count * (count - 1))
+            results.append((mean, math.sqrt(variance) / mean))
+        return results
 
 
 class GenerateNumericSummaries(_DataProcessor):
@@ -259,15 +443,57 @@ class GenerateNumericSummaries(_DataProcessor):
     def process_data(self):
         """Create a summary for each numeric column from the CSV file."""
         self.show_section_header()
-        for key in self.get_numeric_headers():
-            column = self.get_column(key)
-            mean, cv = self.calculate_mean_and_cv(column)
+        # Each column's statistics are updated as the batches stream past,
+        # so no record has to be kept once it has been counted.
+        keys = tuple(self.get_numeric_headers())
+        columns = [(self.get_index(key), _RunningStats()) for key in keys]
+        for batch in self.iter_columns():
+            for index, stats in columns:
+                stats.add_many(batch[index])
+        for key, (_, stats) in zip(keys, columns):
+            mean, cv = stats.mean_and_cv()
             self.show_record_title(key)
             self.print(f'{"Arithmetic Mean:":26}{mean:.3f}')
             self.print(f'{"Coefficient of Variation:":26}{cv:.3f}')
             self.show_record_break()
 
 
+class _RunningStats:
+    """A one-pass mean and variance that merges batches of integers."""
+
+    __slots__ = 'count', 'mean', 'sum_of_squares'
+
+    def __init__(self):
+        """Initialize the _RunningStats instance."""
+        self.count = 0
+        self.mean = 0.0
+        self.sum_of_squares = 0.0
+
+    def add_many(self, values):
+        """Update the statistics with a whole batch of values at once."""
+        count = len(values)
+        if count:
+            total = sum(values)
+            # Integer sums make the batch's own squared deviations exact;
+            # the batch is then folded in with the parallel Welford update.
+            squares = (sum(map(operator.mul, values, values)) * count
+                       - total * total) / count
+            delta = total / count - self.mean
+            combined = self.count + count
+            self.mean += delta * count / combined
+            self.sum_of_squares += \
+                squares + delta * delta * self.count * count / combined
+            self.count = combined
+
+    def mean_and_cv(self):
+        """Calculate the mean and coefficient of variation so far."""
+        if self.count < 2:
+            raise statistics.StatisticsError(
+                'variance requires at least two data points')
+        variance = self.sum_of_squares / (self.count - 1)
+        return self.mean, variance ** 0.5 / self.mean
+
+
 class GenerateTextualSummaries(_DataProcessor):
     """A class that creates anonymous (scrambled) summaries of text columns."""
 
@@ -299,22 +525,58 @@ class GenerateTextualSummaries(_DataProcessor):
 class PrintSpooler(_NamedHolyThread):
     """A class that takes predefined print queues and handles them in order."""
 
-    def __init__(self, print_queues, **overrides):
+    BUFFER_SIZE = 1 << 16
+    ENCODING = 'utf-8'  # Only used when the file is a binary stream.
+
+    def __init__(self, print_queues, buffer_size=BUFFER_SIZE, **overrides):
         """Initialize the PrintSpooler instance."""
         super().__init__()
+        if buffer_size < 0:
+            raise ValueError('buffer_size must not be negative')
         self.__print_queues = print_queues
+        self.__buffer_size = buffer_size
+        self.__file = overrides.pop('file', None)
+        self.__flush = overrides.pop('flush', False)
         self.__overrides = overrides
 
     def run(self):
         """Take all print instructions and display them with the overrides."""
-        for print_queue in self.__print_queues:
-            while True:
-                item = _DataProcessor.get_item(print_queue)
-                if item is _DataProcessor.END_OF_DATA:
-                    break
-                args, kwargs = item
-                print(*args, **kwargs | self.__overrides)
+        # The file is looked up here so that a replaced sys.stdout is used.
+        file = sys.stdout if self.__file is None else self.__file
+        binary = isinstance(file, (io.RawIOBase, io.BufferedIOBase))
+        pieces, pending = [], 0
+        try:
+            for print_queue in self.__print_queues:
+                while True:
+                    item = _DataProcessor.get_item(print_queue)
+                    if item is _DataProcessor.END_OF_DATA:
+                        break
+                    if type(item) is not str:
+                        item = self.__render(*item)
+                    pieces.append(item)
+                    pending += len(item)
+                    if pending >= self.__buffer_size:
+                        self.__write(file, binary, pieces)
+                        pieces, pending = [], 0
+        finally:
+            self.__write(file, binary, pieces)
+            file.flush()
+
+    def __render(self, args, kwargs):
+        """Turn the arguments of a print call into the text it would show."""
+        options = kwargs | self.__overrides
+        sep, end = options.get('sep'), options.get('end')
+        return (' ' if sep is None else sep).join(map(str, args)) \
+            + ('\n' if end is None else end)
+
+    def __write(self, file, binary, pieces):
+        """Join the pieces into one buffer and write it to the file."""
+        if pieces:
+            text = ''.join(pieces)
+            file.write(text.encode(self.ENCODING) if binary else text)
+            if self.__flush:
+                file.flush()
 
 
 if __name__ == '__main__':
-    main()
+    main('--processes' in sys.argv[1:])